@@ -1,10 +1,30 @@
-from flask import Flask, render_template, request, redirect, session, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, session, url_for, flash, jsonify, Response, stream_with_context
 import mysql.connector
 from mysql.connector import Error
 import json
 from werkzeug.security import generate_password_hash, check_password_hash
 import requests # Para fazer requisições à API FastAPI
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+import gzip
+import io
+import os
+import time
+import click
+
+try:
+    import brotli # Opcional: se não estiver instalado, usamos só gzip
+except ImportError:
+    brotli = None
+
+from services import rollups, metrics
+from services.portfolio import build_portfolio
+from services import archive
+from services import bulk_import
+from services import urgency
+from services import dashboard_lists
+from services import prewarm
+from services.single_flight import single_flight
 
 app = Flask(__name__)
 # CHAVE SECRETA CRÍTICA PARA SESSÕES E SEGURANÇA.
@@ -22,6 +42,95 @@ DB_CONFIG = {
 # URL base do servidor FastAPI
 FASTAPI_BASE_URL = "http://localhost:8000"  
 
+# Compressão de respostas: só vale a pena acima desse tamanho (bytes)
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = {'application/json', 'text/html', 'text/css', 'application/javascript'}
+# Arquivos estáticos levam ?v=<mtime> na URL, então podem ficar em cache por 1 ano
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+
+# Regeneração da análise: quanto tempo esperar pelo worker que já está regenerando
+ANALYSIS_STALE_WAIT = 2   # havendo versão anterior no cache, espera pouco e serve ela
+ANALYSIS_LOCK_WAIT = 60   # sem cache nenhum, espera a geração terminar
+# Rótulos de sentimento: textos por chamada ao FastAPI e no máximo quantos por
+# regeneração (o resto fica para as próximas, dos mais antigos para os mais novos)
+SENTIMENT_LABEL_CHUNK = 500
+SENTIMENT_LABEL_MAX_PER_RUN = 2000
+
+# Usuários (ids, separados por vírgula) que podem ver /api/metrics; vazio = ninguém
+METRICS_ADMIN_USER_IDS = {int(uid) for uid in os.getenv("METRICS_ADMIN_USER_IDS", "").split(",") if uid.strip().isdigit()}
+
+# Alertas de urgência (SSE): intervalo entre consultas ao banco e duração de cada
+# stream; ao fim o EventSource reconecta sozinho, sem prender o worker por muito tempo
+ALERT_STREAM_POLL_SECONDS = 3
+ALERT_STREAM_MAX_SECONDS = 25
+# Navegadores sem EventSource consultam /api/alerts com este intervalo
+ALERT_POLL_INTERVAL = 5
+
+# Quantas respostas de texto vão de amostra no payload da análise (o resto é paginado)
+RAW_SAMPLE_SIZE = 5
+# Tamanho padrão / máximo de página do endpoint de respostas brutas
+RAW_PAGE_SIZE = 50
+RAW_PAGE_MAX = 200
+
+# --- Cache HTTP e Compressão ---
+
+@app.url_defaults
+def static_cache_buster(endpoint, values):
+    """Adiciona ?v=<mtime> às URLs de /static, para o cache longo não servir CSS velho."""
+    if endpoint == 'static' and 'filename' in values:
+        path = os.path.join(app.static_folder, values['filename'])
+        if os.path.isfile(path):
+            values['v'] = int(os.stat(path).st_mtime)
+
+def analysis_etag(form_id: int, response_count: int) -> str:
+    """
+    A análise só muda quando muda o número de respostas, então ele é a versão.
+    Vai como ETag fraca: o mesmo conteúdo sai em bytes diferentes por codificação.
+    """
+    return f"analysis-{form_id}-{response_count}"
+
+@app.after_request
+def conditional_and_compress(response):
+    """
+    1. APIs GET: ETag (se a rota não definiu uma) + 304 quando o cliente já tem a versão.
+    2. Comprime JSON/HTML/CSS grandes com brotli (se disponível) ou gzip.
+    A ETag é fraca: identity, gzip e br têm bytes diferentes para o mesmo conteúdo,
+    e uma tag forte prometeria representações idênticas (quebra Range/caches).
+    """
+    if request.method == 'GET' and request.path.startswith('/api/') and response.status_code == 200 \
+            and not response.is_streamed:
+        etag, weak = response.get_etag()
+        if not etag:
+            response.add_etag()
+            etag, weak = response.get_etag()
+        if not weak:
+            response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli and accepted['br']:
+        response.set_data(brotli.compress(data, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag and not weak and 'Content-Encoding' in response.headers:
+        response.set_etag(etag, weak=True)
+    return response
+
 # --- Funções Auxiliares (IA e Banco) ---
 
 def get_db_connection():
@@ -39,7 +148,7 @@ def fetch_form_with_questions(form_id, user_id=None):
     cursor = conn.cursor(dictionary=True)
 
     # 1. Buscar formulário
-    cursor.execute("SELECT id, title, description, user_id FROM forms WHERE id = %s", (form_id,))
+    cursor.execute("SELECT id, title, description, user_id, archived_at, archive_move FROM forms WHERE id = %s", (form_id,))
     form = cursor.fetchone()
     
     if not form:
@@ -90,6 +199,77 @@ def call_fastapi_full_analysis(texts: List[str]) -> Dict[str, Any]:
             "summary": {"summary_text": f"ERRO ao conectar ao servidor de IA: {e}"}
         }
 
+def call_fastapi_sentiment_labels(texts: List[str]) -> List[Optional[str]]:
+    """
+    Chama a API FastAPI para obter o sentimento de cada texto (mesma ordem), em
+    blocos de SENTIMENT_LABEL_CHUNK. Se um bloco falhar, ele e os seguintes ficam None.
+    """
+    url = f"{FASTAPI_BASE_URL}/analyze/sentiment/labels"
+
+    labels: List[Optional[str]] = []
+    for start in range(0, len(texts), SENTIMENT_LABEL_CHUNK):
+        chunk = texts[start:start + SENTIMENT_LABEL_CHUNK]
+        try:
+            response = requests.post(url, json=chunk, timeout=30)
+            response.raise_for_status()
+            labels.extend(response.json())
+        except requests.exceptions.RequestException as e:
+            print(f"ERRO DE CONEXÃO com o FastAPI (sentimento por texto): {e}")
+            return labels + [None] * (len(texts) - len(labels))
+    return labels
+
+def call_fastapi_summary(texts: List[str]) -> str:
+    """Chama a API FastAPI só para o resumo (Gemini) de uma lista de textos."""
+    url = f"{FASTAPI_BASE_URL}/generate/summary"
+
+    if not texts:
+        return "Sem respostas suficientes para análise."
+
+    try:
+        response = requests.post(url, json=texts, timeout=30)
+        response.raise_for_status()
+        return response.json()['summary_text']
+    except requests.exceptions.RequestException as e:
+        print(f"ERRO DE CONEXÃO com o FastAPI (resumo): {e}")
+        return f"ERRO ao conectar ao servidor de IA: {e}"
+
+def slim_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte caches antigos (com raw_responses completo) para o payload enxuto."""
+    for q_an in data.get('questions_analysis', []):
+        a_data = q_an.get('analysis_data', {})
+        if 'raw_responses' in a_data:
+            raw = a_data.pop('raw_responses') or []
+            a_data['answer_count'] = len(raw)
+            a_data['raw_sample'] = raw[-RAW_SAMPLE_SIZE:][::-1]
+    return data
+
+def parse_trend_datetime(value):
+    """ISO 8601 -> datetime ingênuo no horário local do servidor (o mesmo dos buckets)."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"data inválida: '{value}' (use ISO 8601)")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def parse_trend_params():
+    """Lê granularity/start/end da query string. Retorna (granularity, start, end) ou levanta ValueError."""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in rollups.GRANULARITIES:
+        raise ValueError(f"granularity deve ser um de {', '.join(rollups.GRANULARITIES)}")
+
+    start, end = rollups.default_range(granularity)
+    if request.args.get('start'):
+        start = parse_trend_datetime(request.args['start'])
+    if request.args.get('end'):
+        end = parse_trend_datetime(request.args['end'])
+        if len(request.args['end']) == 10: # Só a data: inclui o dia inteiro
+            end = end.replace(hour=23, minute=59, second=59)
+    if start > end:
+        raise ValueError("start deve ser anterior a end")
+    return granularity, start, end
+
 # --- Rotas de Autenticação ---
 
 @app.route('/')
@@ -167,51 +347,40 @@ def dashboard():
     cursor = conn.cursor(dictionary=True)
     user_id = session['user_id']
     
-    # 1. Buscar Listas de Formulários
-    cursor.execute("""
-        SELECT f.*, 
-        (SELECT COUNT(*) FROM responses r WHERE r.form_id = f.id) as response_count
-        FROM forms f 
-        WHERE f.user_id = %s 
-        ORDER BY f.created_at DESC
-    """, (user_id,))
-    forms_created = cursor.fetchall()
-
-    cursor.execute("""
-        SELECT f.*, r.submitted_at
-        FROM responses r
-        JOIN forms f ON r.form_id = f.id
-        WHERE r.user_id = %s
-        GROUP BY f.id, r.submitted_at
-        ORDER BY r.submitted_at DESC
-    """, (user_id,))
-    forms_answered = cursor.fetchall()
+    # 1. Primeira página de cada lista (o resto vem por scroll infinito via HTMX)
+    created_page = dashboard_lists.fetch_created_page(cursor, user_id)
+    answered_page = dashboard_lists.fetch_answered_page(cursor, user_id)
 
     # 2. CALCULAR ESTATÍSTICAS (STATS) para o novo HTML
     
-    # A. Totais Simples
-    total_forms_created = len(forms_created)
-    total_forms_answered = len(forms_answered)
-    total_responses_received = sum(f['response_count'] for f in forms_created)
+    # A. Totais Simples (COUNTs, sem carregar as listas inteiras)
+    counts = dashboard_lists.fetch_dashboard_counts(cursor, user_id)
+    total_forms_created = counts['total_forms']
+    total_forms_answered = counts['forms_answered_count']
+    total_responses_received = counts['total_responses']
     
     # Pendentes (Exemplo: Total Forms no sistema que não são meus e eu não respondi)
     cursor.execute("""
         SELECT COUNT(f.id) as pending
         FROM forms f
         WHERE f.user_id != %s 
+        AND f.archived_at IS NULL
         AND f.id NOT IN (SELECT form_id FROM responses WHERE user_id = %s)
     """, (user_id, user_id))
     pending_forms_count = cursor.fetchone()['pending']
 
-    # B. Gráfico 1: Respostas por Mês (CORRIGIDO: ORDER BY MIN)
+    # B. Gráfico 1: Respostas por Mês (lê só os rollups mensais, sem varrer responses)
     cursor.execute("""
-        SELECT DATE_FORMAT(r.submitted_at, '%b') as month_name, COUNT(r.id) as count
-        FROM responses r
-        JOIN forms f ON r.form_id = f.id
-        WHERE f.user_id = %s
-        GROUP BY DATE_FORMAT(r.submitted_at, '%Y-%m'), month_name
-        ORDER BY MIN(r.submitted_at) ASC
-        LIMIT 6
+        SELECT * FROM (
+            SELECT DATE_FORMAT(rr.bucket_start, '%b') as month_name, rr.bucket_start, SUM(rr.response_count) as count
+            FROM response_rollups rr
+            JOIN forms f ON rr.form_id = f.id
+            WHERE f.user_id = %s AND rr.granularity = 'month'
+            GROUP BY rr.bucket_start
+            ORDER BY rr.bucket_start DESC
+            LIMIT 6
+        ) AS last_months
+        ORDER BY bucket_start ASC
     """, (user_id,))
     month_data = cursor.fetchall()
     
@@ -243,11 +412,43 @@ def dashboard():
     
     return render_template('dashboard.html',
         user_name=session['user_name'],
-        forms_created=forms_created,
-        forms_answered=forms_answered,
+        forms_created=created_page['items'],
+        created_next=created_page['next_cursor'],
+        forms_answered=answered_page['items'],
+        answered_next=answered_page['next_cursor'],
         stats=stats 
     )
 
+def render_dashboard_list(fetch_page, template: str):
+    """Página seguinte de uma lista do dashboard (busca, ordenação e cursor vêm da query string)."""
+    if 'user_id' not in session:
+        return "Não autorizado", 401
+
+    search = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'newest')
+    conn = get_db_connection()
+    if not conn:
+        return "Erro de conexão com o banco.", 500
+    try:
+        cursor = conn.cursor(dictionary=True)
+        page = fetch_page(cursor, session['user_id'], search, sort, request.args.get('after'))
+    except ValueError as e:
+        return str(e), 400
+    finally:
+        conn.close()
+
+    metrics.incr('dashboard_list_pages')
+    return render_template(template, items=page['items'], next_cursor=page['next_cursor'],
+                           search=search, sort=sort, first_page=not request.args.get('after'))
+
+@app.route('/dashboard/forms/created')
+def dashboard_forms_created():
+    return render_dashboard_list(dashboard_lists.fetch_created_page, 'dashboard_created_partial.html')
+
+@app.route('/dashboard/forms/answered')
+def dashboard_forms_answered():
+    return render_dashboard_list(dashboard_lists.fetch_answered_page, 'dashboard_answered_partial.html')
+
 # --- Gerenciamento de Formulários (CRUD + HTMX) ---
 
 @app.route('/form/create', methods=['GET', 'POST'])
@@ -276,6 +477,10 @@ def edit_form(form_id):
     if not form:
         flash('Acesso negado ou não encontrado.', 'danger')
         return redirect(url_for('dashboard'))
+    if archive.is_closed(form):
+        # Opções regravadas quebrariam as respostas arquivadas (answers_archive não tem FK de opção)
+        flash('Reabra o formulário para editar as perguntas.', 'info')
+        return redirect(url_for('dashboard'))
     return render_template('form_editor.html', form=form, questions=questions, json_dump=json.dumps)
 
 @app.route('/form/<int:form_id>/delete', methods=['DELETE'])
@@ -304,6 +509,7 @@ def add_question(form_id):
     # Verifica dono do form
     form, _ = fetch_form_with_questions(form_id, session['user_id'])
     if not form: return '', 403
+    if archive.is_closed(form): return '', 409
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -333,11 +539,14 @@ def update_question(question_id):
     cursor = conn.cursor(dictionary=True)
     
     # Verifica permissão
-    cursor.execute("SELECT f.user_id FROM questions q JOIN forms f ON q.form_id=f.id WHERE q.id=%s", (question_id,))
+    cursor.execute("SELECT f.user_id, f.archived_at, f.archive_move FROM questions q JOIN forms f ON q.form_id=f.id WHERE q.id=%s", (question_id,))
     row = cursor.fetchone()
     if not row or row['user_id'] != session['user_id']:
         conn.close()
         return 'Erro', 403
+    if archive.is_closed(row):
+        conn.close()
+        return 'Formulário arquivado', 409
 
     # Atualiza
     text = request.form.get('questionText')
@@ -363,9 +572,9 @@ def delete_question(question_id):
     if 'user_id' not in session: return '', 401
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT f.user_id FROM questions q JOIN forms f ON q.form_id=f.id WHERE q.id=%s", (question_id,))
+    cursor.execute("SELECT f.user_id, f.archived_at, f.archive_move FROM questions q JOIN forms f ON q.form_id=f.id WHERE q.id=%s", (question_id,))
     row = cursor.fetchone()
-    if row and row['user_id'] == session['user_id']:
+    if row and row['user_id'] == session['user_id'] and not archive.is_closed(row):
         cursor.execute("DELETE FROM questions WHERE id=%s", (question_id,))
         conn.commit()
         conn.close()
@@ -381,18 +590,30 @@ def view_form(form_id):
     if not form:
         flash('Formulário não encontrado.', 'danger')
         return redirect(url_for('home'))
+    if archive.is_closed(form):
+        flash('Este formulário foi encerrado e não aceita mais respostas.', 'info')
+        return redirect(url_for('home'))
     return render_template('view_form.html', form=form, questions=questions)
 
 @app.route('/form/submit/<int:form_id>', methods=['POST'])
 def submit_form(form_id):
     form, questions = fetch_form_with_questions(form_id)
     if not form: return redirect(url_for('home'))
+    if archive.is_closed(form):
+        flash('Este formulário foi encerrado e não aceita mais respostas.', 'info')
+        return redirect(url_for('home'))
     
     conn = get_db_connection()
     cursor = conn.cursor()
     user_id = session.get('user_id')
     
+    text_answer_ids = []
     try:
+        # Rechecagem com lock: o arquivamento pode ter começado depois da leitura acima
+        if not archive.lock_open_form(cursor, form_id):
+            conn.rollback()
+            flash('Este formulário foi encerrado e não aceita mais respostas.', 'info')
+            return redirect(url_for('home'))
         cursor.execute("INSERT INTO responses (form_id, user_id) VALUES (%s, %s)", (form_id, user_id))
         resp_id = cursor.lastrowid
         
@@ -400,7 +621,9 @@ def submit_form(form_id):
             qid = q['id']
             if q['question_type'] == 'text':
                 val = request.form.get(f"q_{qid}_text")
-                if val: cursor.execute("INSERT INTO answers (response_id, question_id, answer_text) VALUES (%s,%s,%s)", (resp_id, qid, val))
+                if val:
+                    cursor.execute("INSERT INTO answers (response_id, question_id, answer_text) VALUES (%s,%s,%s)", (resp_id, qid, val))
+                    text_answer_ids.append(cursor.lastrowid)
             
             elif q['question_type'] == 'multiple_choice':
                 val = request.form.get(f"q_{qid}_choice")
@@ -411,7 +634,13 @@ def submit_form(form_id):
                 for v in vals:
                     cursor.execute("INSERT INTO answers (response_id, question_id, option_id) VALUES (%s,%s,%s)", (resp_id, qid, v))
         
+        # Atualiza os rollups de volume na mesma transação da resposta
+        rollups.record_responses(cursor, [resp_id])
+        # Marca para o processo de pré-aquecimento regenerar a análise
+        prewarm.mark_pending(cursor, form_id)
         conn.commit()
+        # Urgência é calculada em segundo plano, sem atrasar a resposta ao usuário
+        urgency.enqueue(text_answer_ids, get_db_connection, call_fastapi_sentiment_labels)
         return render_template('form_submitted.html', form=form)
     except Exception as e:
         conn.rollback()
@@ -431,11 +660,12 @@ def view_my_response(form_id):
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     
-    # Busca respostas do usuário
-    cursor.execute("""
+    # Busca respostas do usuário (no arquivo, se o formulário foi arquivado)
+    responses_table, answers_table = archive.tables_for(form)
+    cursor.execute(f"""
         SELECT a.question_id, a.answer_text, a.option_id
-        FROM answers a
-        JOIN responses r ON a.response_id = r.id
+        FROM {answers_table} a
+        JOIN {responses_table} r ON a.response_id = r.id
         WHERE r.form_id = %s AND r.user_id = %s
     """, (form_id, session['user_id']))
     raw_answers = cursor.fetchall()
@@ -460,37 +690,56 @@ def form_results(form_id):
     if not form: return redirect(url_for('dashboard'))
     return render_template('form_results.html', form=form)
 
-@app.route('/api/form/<int:form_id>/analysis', methods=['GET'])
-def get_form_analysis_data(form_id):
-    if 'user_id' not in session: return jsonify({"error": "401"}), 401
-    
-    conn = get_db_connection()
-    if not conn: return jsonify({"error": "DB Error"}), 500
-    cursor = conn.cursor(dictionary=True)
+def fetch_analysis_version(cursor, form: Dict[str, Any]):
+    """Retorna (total de respostas atual, linha do analysis_cache sem o blob)."""
+    responses_table, _ = archive.tables_for(form)
+    cursor.execute(f"SELECT COUNT(r.id) AS total FROM {responses_table} r WHERE r.form_id=%s", (form['id'],))
+    total_resp = cursor.fetchone()['total']
+    # UNIX_TIMESTAMP converte usando o fuso da sessão do MySQL: o resultado é UTC de verdade
+    cursor.execute("SELECT response_count, UNIX_TIMESTAMP(updated_at) AS updated_ts FROM analysis_cache WHERE form_id=%s", (form['id'],))
+    return total_resp, cursor.fetchone()
 
-    # Verifica permissão
-    cursor.execute("SELECT id, title FROM forms WHERE id=%s AND user_id=%s", (form_id, session['user_id']))
-    form = cursor.fetchone()
-    if not form:
-        conn.close()
-        return jsonify({"error": "404"}), 404
+def serve_cached_analysis(conn, form_id: int, response_count: int, cached: Dict[str, Any]):
+    """Responde com a análise do cache (ou 304, se o cliente já tem essa versão)."""
+    etag = analysis_etag(form_id, response_count)
+    last_modified = None
+    if cached['updated_ts'] is not None:
+        last_modified = datetime.fromtimestamp(int(cached['updated_ts']), timezone.utc)
 
-    # Conta respostas atuais
-    cursor.execute("SELECT COUNT(id) AS total FROM responses WHERE form_id=%s", (form_id,))
-    total_resp = cursor.fetchone()['total']
+    # If-None-Match tem precedência; sem ele, vale o If-Modified-Since (precisão de segundos)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and last_modified and last_modified <= since)
+    if not_modified:
+        # Cliente já tem essa versão: 304 sem ler nem serializar a análise
+        response = app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        return response
 
-    # Checa Cache
-    cursor.execute("SELECT response_count, analysis_data FROM analysis_cache WHERE form_id=%s", (form_id,))
-    cached = cursor.fetchone()
-    
-    if cached and cached['response_count'] == total_resp:
-        conn.close()
-        data = cached['analysis_data']
-        if isinstance(data, str): data = json.loads(data)
-        return jsonify(data)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT analysis_data FROM analysis_cache WHERE form_id=%s", (form_id,))
+    data = cursor.fetchone()['analysis_data']
+    if isinstance(data, str): data = json.loads(data)
+    response = jsonify(slim_analysis(data))
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+def analysis_has_ai_errors(results: Dict[str, Any]) -> bool:
+    """True se alguma pergunta ficou com o texto de erro do FastAPI no lugar do resumo."""
+    return any(str(q_an['analysis_data'].get('summary_text', '')).startswith('ERRO')
+               for q_an in results['questions_analysis'])
 
-    # GERA NOVA ANÁLISE
-    _, questions = fetch_form_with_questions(form_id, session['user_id'])
+def generate_form_analysis(conn, form: Dict[str, Any], total_resp: int) -> Dict[str, Any]:
+    """Gera a análise completa do formulário (chama a IA) e grava no analysis_cache."""
+    cursor = conn.cursor(dictionary=True)
+    _, questions = fetch_form_with_questions(form['id'])
+    _, answers_table = archive.tables_for(form)
     results = {
         "form_id": form['id'],
         "form_title": form['title'],
@@ -502,18 +751,38 @@ def get_form_analysis_data(form_id):
         q_an = {"question_id": q['id'], "question_title": q['question_text'], "question_type": q['question_type'], "analysis_data": {}}
         
         if q['question_type'] == 'text':
-            cursor.execute("SELECT answer_text FROM answers WHERE question_id=%s AND answer_text IS NOT NULL", (q['id'],))
-            texts = [row['answer_text'] for row in cursor.fetchall() if row['answer_text'].strip()]
+            cursor.execute(f"SELECT a.id, a.answer_text, a.sentiment FROM {answers_table} a WHERE a.question_id=%s AND a.answer_text IS NOT NULL ORDER BY a.id", (q['id'],))
+            rows = [row for row in cursor.fetchall() if row['answer_text'].strip()]
+            texts = [row['answer_text'] for row in rows]
+
+            # Classifica só as respostas novas (sem sentimento) e alimenta os rollups
+            unlabelled = [row for row in rows if not row['sentiment']] if not archive.is_closed(form) else []
+            unlabelled = unlabelled[:SENTIMENT_LABEL_MAX_PER_RUN]
+            if unlabelled:
+                labels = call_fastapi_sentiment_labels([row['answer_text'] for row in unlabelled])
+                try:
+                    rollups.record_sentiments(cursor, [(row['id'], label) for row, label in zip(unlabelled, labels)])
+                    conn.commit()
+                except Error as e:
+                    conn.rollback()
+                    print(f"Erro rollup sentimento: {e}")
             
             # Chama IA
             ai_data = call_fastapi_full_analysis(texts) if texts else {"sentiment": {"positive":0,"neutral":0,"negative":0}, "summary": {"summary_text": "Sem dados"}}
-            q_an['analysis_data'] = {"summary_text": ai_data['summary']['summary_text'], "sentiment": ai_data['sentiment'], "raw_responses": texts}
+            # Só agregados + uma amostra das mais recentes; o resto vem paginado de /api/question/<id>/answers
+            q_an['analysis_data'] = {
+                "summary_text": ai_data['summary']['summary_text'],
+                "sentiment": ai_data['sentiment'],
+                "key_phrases": ai_data.get('key_phrases', []),
+                "answer_count": len(texts),
+                "raw_sample": texts[-RAW_SAMPLE_SIZE:][::-1]
+            }
 
         elif q['question_type'] in ['multiple_choice', 'checkbox']:
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT qo.option_text, COUNT(a.id) as cnt 
                 FROM question_options qo 
-                LEFT JOIN answers a ON qo.id=a.option_id 
+                LEFT JOIN {answers_table} a ON qo.id=a.option_id 
                 WHERE qo.question_id=%s GROUP BY qo.option_text ORDER BY cnt DESC
             """, (q['id'],))
             stats = cursor.fetchall()
@@ -526,19 +795,498 @@ def get_form_analysis_data(form_id):
             }
         results['questions_analysis'].append(q_an)
 
+    # Falha da IA não vai para o cache: senão a mensagem de erro seria servida
+    # como análise "em dia" até chegar uma nova resposta
+    if analysis_has_ai_errors(results):
+        metrics.incr('analysis_ai_errors')
+        return results
+
     # Salva Cache
     try:
         json_data = json.dumps(results)
         cursor.execute("""
             INSERT INTO analysis_cache (form_id, response_count, analysis_data) VALUES (%s, %s, %s)
             ON DUPLICATE KEY UPDATE response_count=VALUES(response_count), analysis_data=VALUES(analysis_data)
-        """, (form_id, total_resp, json_data))
+        """, (form['id'], total_resp, json_data))
         conn.commit()
     except Exception as e:
         print(f"Erro cache: {e}")
 
+    return results
+
+@app.route('/api/form/<int:form_id>/analysis', methods=['GET'])
+def get_form_analysis_data(form_id):
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+
+    # Verifica permissão
+    cursor.execute("SELECT id, title, archived_at, archive_move FROM forms WHERE id=%s AND user_id=%s", (form_id, session['user_id']))
+    form = cursor.fetchone()
+    if not form:
+        conn.close()
+        return jsonify({"error": "404"}), 404
+
+    # Conta a visualização (prioridade do pré-aquecimento) em memória; o banco só
+    # recebe os totais acumulados, no máximo uma vez por minuto
+    prewarm.count_view(form_id)
+    try:
+        if prewarm.flush_views(cursor):
+            conn.commit()
+    except Error as e:
+        print(f"Erro ao gravar visualizações: {e}")
+
+    total_resp, cached = fetch_analysis_version(cursor, form)
+    if cached and cached['response_count'] == total_resp:
+        metrics.incr('analysis_cache_fresh')
+        response = serve_cached_analysis(conn, form_id, total_resp, cached)
+        conn.close()
+        return response
+
+    # Cache desatualizado: só um worker regenera, os outros esperam ou servem a versão anterior
+    wait = ANALYSIS_STALE_WAIT if cached else ANALYSIS_LOCK_WAIT
+    with single_flight(conn, f"analysis:{form_id}", wait) as acquired:
+        if not acquired:
+            if cached:
+                metrics.incr('analysis_stale_served')
+                response = serve_cached_analysis(conn, form_id, cached['response_count'], cached)
+                response.headers['X-Analysis-Stale'] = '1'
+            else:
+                metrics.incr('analysis_lock_timeouts')
+                response = jsonify({"error": "Análise em processamento, tente novamente."})
+                response.status_code = 503
+                response.headers['Retry-After'] = '5'
+        else:
+            # Encerra a transação de leitura para enxergar o que outro worker gravou enquanto esperávamos
+            conn.commit()
+            total_resp, cached = fetch_analysis_version(cursor, form)
+            if cached and cached['response_count'] == total_resp:
+                metrics.incr('analysis_collapsed')
+                response = serve_cached_analysis(conn, form_id, total_resp, cached)
+            else:
+                metrics.incr('analysis_regenerations')
+                results = generate_form_analysis(conn, form, total_resp)
+                response = jsonify(results)
+                if not analysis_has_ai_errors(results):
+                    response.set_etag(analysis_etag(form_id, total_resp), weak=True)
+                    response.last_modified = datetime.now(timezone.utc)
+
+    conn.close()
+    return response
+
+def prewarm_form_analysis(conn, form: Dict[str, Any]) -> str:
+    """Regenera a análise fora de requisição (usado pelo processo flask prewarm-analyses)."""
+    cursor = conn.cursor(dictionary=True)
+    # Sem espera: se um usuário já está gerando, deixa com ele
+    with single_flight(conn, f"analysis:{form['id']}", 0) as acquired:
+        if not acquired:
+            return 'busy'
+        total_resp, cached = fetch_analysis_version(cursor, form)
+        if cached and cached['response_count'] == total_resp:
+            return 'fresh'
+        results = generate_form_analysis(conn, form, total_resp)
+    return 'failed' if analysis_has_ai_errors(results) else 'warmed'
+
+@app.cli.command('prewarm-analyses')
+@click.option('--once', is_flag=True, help='Roda um único ciclo e sai.')
+def prewarm_analyses_command(once):
+    """Processo de pré-aquecimento das análises (uso: flask prewarm-analyses)."""
+    try:
+        prewarm.run(get_db_connection, prewarm_form_analysis, once=once)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@app.route('/api/portfolio', methods=['GET'])
+def get_portfolio_analysis():
+    """
+    Visão executiva de todos os formulários do usuário (ou dos ?form_id= informados):
+    volume, sentimento, principais tópicos e os resumos de cada formulário, lidos dos
+    rollups e do analysis_cache. Com ?summary=1 também gera um resumo consolidado
+    a partir dos resumos por formulário (uma única chamada à IA).
+    """
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+
+    cursor.execute("SELECT id, title FROM forms WHERE user_id=%s ORDER BY created_at DESC", (session['user_id'],))
+    forms = cursor.fetchall()
+    requested = set(request.args.getlist('form_id', type=int))
+    if requested:
+        forms = [f for f in forms if f['id'] in requested]
+
+    portfolio = build_portfolio(cursor, forms)
+    conn.close()
+
+    if request.args.get('summary') == '1':
+        texts = [f"{f['form_title']}: {text}" for f in portfolio['forms'] for text in f['summaries']]
+        portfolio['consolidated_summary'] = call_fastapi_summary(texts)
+
+    return jsonify(portfolio)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Contadores do processo atual (cache de análise, regenerações, locks). Só para administradores."""
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    if session['user_id'] not in METRICS_ADMIN_USER_IDS: return jsonify({"error": "403"}), 403
+    return jsonify(metrics.snapshot())
+
+@app.route('/api/question/<int:question_id>/answers', methods=['GET'])
+def get_question_answers(question_id):
+    """
+    Respostas de texto de uma pergunta, paginadas por keyset (answers.id).
+    Parâmetros: ?after=<id do último item>&limit=50&sort=newest|oldest&sentiment=positive|neutral|negative
+    """
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+
+    sort = request.args.get('sort', 'newest')
+    if sort not in ('newest', 'oldest'):
+        return jsonify({"error": "sort deve ser newest ou oldest"}), 400
+    sentiment = request.args.get('sentiment')
+    if sentiment and sentiment not in rollups.SENTIMENT_LABELS:
+        return jsonify({"error": f"sentiment deve ser um de {', '.join(rollups.SENTIMENT_LABELS)}"}), 400
+    limit = min(max(request.args.get('limit', RAW_PAGE_SIZE, type=int), 1), RAW_PAGE_MAX)
+    after = request.args.get('after', type=int)
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+
+    # Verifica permissão
+    cursor.execute("SELECT f.user_id, f.archived_at, f.archive_move FROM questions q JOIN forms f ON q.form_id=f.id WHERE q.id=%s", (question_id,))
+    row = cursor.fetchone()
+    if not row or row['user_id'] != session['user_id']:
+        conn.close()
+        return jsonify({"error": "404"}), 404
+    responses_table, answers_table = archive.tables_for(row)
+
+    where = ["a.question_id = %s", "a.answer_text IS NOT NULL"]
+    params = [question_id]
+    if sentiment:
+        where.append("a.sentiment = %s")
+        params.append(sentiment)
+    if after:
+        where.append("a.id < %s" if sort == 'newest' else "a.id > %s")
+        params.append(after)
+
+    # Busca um item a mais só para saber se existe próxima página
+    cursor.execute(f"""
+        SELECT a.id, a.answer_text, a.sentiment, r.submitted_at
+        FROM {answers_table} a
+        JOIN {responses_table} r ON a.response_id = r.id
+        WHERE {' AND '.join(where)}
+        ORDER BY a.id {'DESC' if sort == 'newest' else 'ASC'}
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+    conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        "question_id": question_id,
+        "answers": [{
+            "id": r['id'],
+            "text": r['answer_text'],
+            "sentiment": r['sentiment'],
+            "submitted_at": r['submitted_at'].isoformat() if r['submitted_at'] else None
+        } for r in rows],
+        "next_after": rows[-1]['id'] if has_more else None
+    })
+
+# --- Arquivamento (Retenção) ---
+
+@app.route('/form/<int:form_id>/archive', methods=['POST'])
+def archive_form(form_id):
+    """Encerra o formulário e move as respostas para as tabelas de arquivo."""
+    if 'user_id' not in session: return redirect(url_for('login'))
+    form, _ = fetch_form_with_questions(form_id, session['user_id'])
+    if not form:
+        flash('Acesso negado ou não encontrado.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    conn = get_db_connection()
+    if conn:
+        try:
+            moved = archive.archive_form(conn, form_id)
+            flash(f'Formulário arquivado ({moved} respostas movidas).', 'success')
+        except Error as e:
+            flash(f'Erro ao arquivar: {e}', 'danger')
+        finally:
+            conn.close()
+    return redirect(url_for('dashboard'))
+
+@app.route('/form/<int:form_id>/unarchive', methods=['POST'])
+def unarchive_form(form_id):
+    """Reabre o formulário, devolvendo as respostas às tabelas principais."""
+    if 'user_id' not in session: return redirect(url_for('login'))
+    form, _ = fetch_form_with_questions(form_id, session['user_id'])
+    if not form:
+        flash('Acesso negado ou não encontrado.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    conn = get_db_connection()
+    if conn:
+        try:
+            archive.restore_form(conn, form_id)
+            flash('Formulário reaberto.', 'success')
+        except Error as e:
+            flash(f'Erro ao reabrir: {e}', 'danger')
+        finally:
+            conn.close()
+    return redirect(url_for('dashboard'))
+
+@app.cli.command('archive-forms')
+@click.option('--days', default=365, show_default=True, help='Arquiva formulários sem respostas há mais de N dias.')
+def archive_forms_command(days):
+    """Arquiva campanhas encerradas (uso: flask archive-forms --days 365)."""
+    conn = get_db_connection()
+    if not conn: return
+    form_ids = archive.find_inactive_forms(conn.cursor(), days)
+    for form_id in form_ids:
+        moved = archive.archive_form(conn, form_id)
+        print(f"Formulário {form_id} arquivado ({moved} respostas).")
+    conn.close()
+    print(f"{len(form_ids)} formulário(s) arquivado(s).")
+
+# --- Importação em Massa ---
+
+@app.route('/api/form/<int:form_id>/import', methods=['POST'])
+def import_form_responses(form_id):
+    """
+    Importa respostas históricas de um arquivo CSV/JSONL (multipart: file, format,
+    mapping opcional em JSON, dry_run=1 para só validar). O progresso é enviado
+    como NDJSON, uma linha por lote gravado, e a última linha é o relatório final.
+    """
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    form, questions = fetch_form_with_questions(form_id, session['user_id'])
+    if not form: return jsonify({"error": "404"}), 404
+    if archive.is_closed(form): return jsonify({"error": "Formulário arquivado não aceita importação."}), 409
+
+    upload = request.files.get('file')
+    if not upload: return jsonify({"error": "Envie o arquivo no campo 'file'."}), 400
+    fmt = request.form.get('format') or ('jsonl' if upload.filename.endswith(('.jsonl', '.ndjson')) else 'csv')
+    try:
+        mapping = json.loads(request.form['mapping']) if request.form.get('mapping') else None
+    except ValueError:
+        return jsonify({"error": "mapping deve ser um JSON {coluna: question_id}."}), 400
+    dry_run = request.form.get('dry_run') == '1'
+
+    def generate():
+        conn = get_db_connection()
+        if not conn:
+            yield json.dumps({"error": "DB Error"}) + "\n"
+            return
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        importer = bulk_import.run_import(conn, form, questions, stream, fmt, mapping, dry_run)
+        try:
+            for report in importer:
+                if report['finished']:
+                    yield json.dumps({"report": report}) + "\n"
+                else:
+                    yield json.dumps({"progress": {k: v for k, v in report.items() if k != 'errors'}}) + "\n"
+        except (ValueError, Error) as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            # Fecha o importador antes da conexão: se o cliente desconectar no meio,
+            # a finalização (rollups / pré-aquecimento) ainda roda com a conexão aberta
+            importer.close()
+            conn.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.cli.command('import-responses')
+@click.argument('form_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Padrão: pela extensão do arquivo.')
+@click.option('--mapping', 'mapping_path', type=click.Path(exists=True, dir_okay=False), help='JSON {coluna: question_id}.')
+@click.option('--dry-run', is_flag=True, help='Só valida, não grava nada.')
+def import_responses_command(form_id, path, fmt, mapping_path, dry_run):
+    """Importa respostas históricas de CSV/JSONL (uso: flask import-responses 12 respostas.csv)."""
+    form, questions = fetch_form_with_questions(form_id)
+    if not form:
+        raise click.ClickException(f"Formulário {form_id} não encontrado.")
+    if archive.is_closed(form):
+        raise click.ClickException("Formulário arquivado não aceita importação.")
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    mapping = None
+    if mapping_path:
+        with open(mapping_path, encoding='utf-8') as f:
+            mapping = json.load(f)
+
+    conn = get_db_connection()
+    if not conn: return
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            report = bulk_import.import_responses(
+                conn, form, questions, stream, fmt, mapping, dry_run,
+                progress=lambda r: print(f"{r['rows_read']} linhas lidas, {r['responses_imported']} respostas / {r['answers_imported']} answers gravados...")
+            )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        conn.close()
+
+    print(f"Concluído: {report['responses_imported']} respostas, {report['answers_imported']} answers, {report['rows_skipped']} linhas puladas.")
+    for err in report['errors']:
+        print(f"  linha {err['row']}: {err['error']}")
+
+# --- Alertas de Urgência ---
+
+@app.before_request
+def ensure_urgency_worker():
+    """Sobe a thread de pontuação (e a varredura de pendentes) já na primeira requisição após um restart."""
+    urgency.start(get_db_connection, call_fastapi_sentiment_labels)
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    """
+    Alertas de urgência dos formulários do usuário com id maior que ?after=.
+    Alternativa ao /api/alerts/stream para navegadores sem EventSource: o
+    dashboard chama a cada `poll_after` segundos. Sem ?after= devolve os mais recentes.
+    """
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    user_id = session['user_id']
+    after_id = request.args.get('after', type=int)
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+    if after_id is None:
+        after_id = urgency.latest_alert_id(cursor, user_id)
+    alerts = urgency.fetch_alerts(cursor, user_id, after_id)
+    conn.close()
+
+    return jsonify({
+        "alerts": alerts,
+        "last_id": alerts[-1]['id'] if alerts else after_id,
+        "poll_after": ALERT_POLL_INTERVAL
+    })
+
+@app.route('/api/alerts/stream')
+def alerts_stream():
+    """
+    Feed Server-Sent Events com os alertas de urgência dos formulários do usuário.
+    Consulta urgent_alerts a cada ALERT_STREAM_POLL_SECONDS (funciona com vários
+    workers), abrindo uma conexão só para cada consulta, e encerra após
+    ALERT_STREAM_MAX_SECONDS; o EventSource reconecta mandando o Last-Event-ID.
+    """
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    user_id = session['user_id']
+    last_id = request.headers.get('Last-Event-ID', type=int)
+
+    def fetch(after_id):
+        conn = get_db_connection()
+        if not conn:
+            return after_id, []
+        try:
+            cursor = conn.cursor(dictionary=True)
+            if after_id is None:
+                after_id = urgency.latest_alert_id(cursor, user_id)
+            return after_id, urgency.fetch_alerts(cursor, user_id, after_id)
+        finally:
+            conn.close()
+
+    def generate():
+        after_id = last_id
+        started = time.monotonic()
+        yield f"retry: {ALERT_STREAM_POLL_SECONDS * 1000}\n\n"
+        while True:
+            after_id, alerts = fetch(after_id)
+            for alert in alerts:
+                after_id = alert['id']
+                yield f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert)}\n\n"
+            # Sem alerta novo, o id ainda anda: a reconexão não reenvia os antigos
+            yield f"id: {after_id}\n\n"
+            if time.monotonic() - started >= ALERT_STREAM_MAX_SECONDS:
+                return
+            time.sleep(ALERT_STREAM_POLL_SECONDS)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.cli.command('score-pending')
+def score_pending_command():
+    """Pontua a urgência das respostas de texto ainda sem nota, sem gerar alertas (ex.: após importação)."""
+    conn = get_db_connection()
+    if not conn: return
+    cursor = conn.cursor()
+    total = 0
+    while True:
+        cursor.execute("SELECT id FROM answers WHERE answer_text IS NOT NULL AND urgency_score IS NULL LIMIT 1000")
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        urgency.score_answers(conn, ids, alerts=False)
+        total += len(ids)
+        print(f"{total} respostas pontuadas...")
+    conn.close()
+
+# --- Tendências (Rollups por Período) ---
+
+@app.route('/api/form/<int:form_id>/trends', methods=['GET'])
+def get_form_trends(form_id):
+    """Série de volume e sentimento de um formulário (?granularity=hour|day|month&start=&end=&question_id=)."""
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    try:
+        granularity, start, end = parse_trend_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+
+    cursor.execute("SELECT id FROM forms WHERE id=%s AND user_id=%s", (form_id, session['user_id']))
+    if not cursor.fetchone():
+        conn.close()
+        return jsonify({"error": "404"}), 404
+
+    series = rollups.fetch_trend(cursor, [form_id], granularity, start, end,
+                                 question_id=request.args.get('question_id', type=int))
+    conn.close()
+    series['form_ids'] = [form_id]
+    return jsonify(series)
+
+@app.route('/api/trends', methods=['GET'])
+def get_portfolio_trends():
+    """Série consolidada de todos os formulários do usuário (ou só dos ?form_id= informados)."""
+    if 'user_id' not in session: return jsonify({"error": "401"}), 401
+    try:
+        granularity, start, end = parse_trend_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "DB Error"}), 500
+    cursor = conn.cursor(dictionary=True)
+
+    cursor.execute("SELECT id FROM forms WHERE user_id=%s", (session['user_id'],))
+    form_ids = [row['id'] for row in cursor.fetchall()]
+    requested = request.args.getlist('form_id', type=int)
+    if requested:
+        form_ids = [fid for fid in form_ids if fid in set(requested)]
+
+    series = rollups.fetch_trend(cursor, form_ids, granularity, start, end)
+    conn.close()
+    series['form_ids'] = form_ids
+    return jsonify(series)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recalcula os rollups a partir de responses/answers (uso: flask rebuild-rollups)."""
+    conn = get_db_connection()
+    if not conn: return
+    cursor = conn.cursor()
+    rollups.rebuild_rollups(cursor)
+    conn.commit()
     conn.close()
-    return jsonify(results)
+    print("Rollups recalculados.")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -28,10 +28,13 @@ CREATE TABLE `answers` (
   `question_id` int NOT NULL,
   `answer_text` text,
   `option_id` int DEFAULT NULL,
+  `sentiment` enum('positive','neutral','negative') DEFAULT NULL,
+  `urgency_score` decimal(4,3) DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `response_id` (`response_id`),
   KEY `question_id` (`question_id`),
   KEY `option_id` (`option_id`),
+  KEY `question_sentiment` (`question_id`,`sentiment`),
   CONSTRAINT `answers_ibfk_1` FOREIGN KEY (`response_id`) REFERENCES `responses` (`id`) ON DELETE CASCADE,
   CONSTRAINT `answers_ibfk_2` FOREIGN KEY (`question_id`) REFERENCES `questions` (`id`) ON DELETE CASCADE,
   CONSTRAINT `answers_ibfk_3` FOREIGN KEY (`option_id`) REFERENCES `question_options` (`id`) ON DELETE CASCADE
@@ -60,8 +63,11 @@ CREATE TABLE `forms` (
   `title` varchar(255) NOT NULL,
   `description` text,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `archived_at` timestamp NULL DEFAULT NULL,
+  `archive_move` enum('archiving','restoring') DEFAULT NULL,
   PRIMARY KEY (`id`),
-  KEY `user_id` (`user_id`),
+  KEY `user_created` (`user_id`,`created_at`,`id`),
+  KEY `user_title` (`user_id`,`title`,`id`),
   CONSTRAINT `forms_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -142,9 +148,11 @@ CREATE TABLE `responses` (
   `form_id` int NOT NULL,
   `user_id` int DEFAULT NULL,
   `submitted_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `imported` tinyint(1) NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`),
   KEY `form_id` (`form_id`),
-  KEY `user_id` (`user_id`),
+  KEY `user_submitted` (`user_id`,`submitted_at`,`id`),
+  KEY `submitted_at` (`submitted_at`),
   CONSTRAINT `responses_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE,
   CONSTRAINT `responses_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -185,6 +193,166 @@ LOCK TABLES `users` WRITE;
 /*!40000 ALTER TABLE `users` DISABLE KEYS */;
 /*!40000 ALTER TABLE `users` ENABLE KEYS */;
 UNLOCK TABLES;
+--
+-- Table structure for table `analysis_cache`
+--
+ 
+DROP TABLE IF EXISTS `analysis_cache`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `analysis_cache` (
+  `form_id` int NOT NULL,
+  `response_count` int NOT NULL DEFAULT '0',
+  `analysis_data` json DEFAULT NULL,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`form_id`),
+  CONSTRAINT `analysis_cache_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `response_rollups`
+--
+ 
+DROP TABLE IF EXISTS `response_rollups`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `response_rollups` (
+  `form_id` int NOT NULL,
+  `granularity` enum('hour','day','month') NOT NULL,
+  `bucket_start` datetime NOT NULL,
+  `response_count` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`form_id`,`granularity`,`bucket_start`),
+  CONSTRAINT `response_rollups_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `sentiment_rollups`
+--
+ 
+DROP TABLE IF EXISTS `sentiment_rollups`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `sentiment_rollups` (
+  `form_id` int NOT NULL,
+  `question_id` int NOT NULL,
+  `granularity` enum('hour','day','month') NOT NULL,
+  `bucket_start` datetime NOT NULL,
+  `positive` int NOT NULL DEFAULT '0',
+  `neutral` int NOT NULL DEFAULT '0',
+  `negative` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`form_id`,`question_id`,`granularity`,`bucket_start`),
+  KEY `form_granularity_bucket` (`form_id`,`granularity`,`bucket_start`),
+  KEY `question_id` (`question_id`),
+  CONSTRAINT `sentiment_rollups_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `sentiment_rollups_ibfk_2` FOREIGN KEY (`question_id`) REFERENCES `questions` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `answers_archive`
+--
+ 
+DROP TABLE IF EXISTS `answers_archive`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `answers_archive` (
+  `id` int NOT NULL,
+  `response_id` int NOT NULL,
+  `question_id` int NOT NULL,
+  `answer_text` text,
+  `option_id` int DEFAULT NULL,
+  `sentiment` enum('positive','neutral','negative') DEFAULT NULL,
+  `urgency_score` decimal(4,3) DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `response_id` (`response_id`),
+  KEY `question_sentiment` (`question_id`,`sentiment`),
+  KEY `option_id` (`option_id`),
+  CONSTRAINT `answers_archive_ibfk_1` FOREIGN KEY (`response_id`) REFERENCES `responses_archive` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `answers_archive_ibfk_2` FOREIGN KEY (`question_id`) REFERENCES `questions` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `responses_archive`
+--
+ 
+DROP TABLE IF EXISTS `responses_archive`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `responses_archive` (
+  `id` int NOT NULL,
+  `form_id` int NOT NULL,
+  `user_id` int DEFAULT NULL,
+  `submitted_at` timestamp NULL DEFAULT NULL,
+  `imported` tinyint(1) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`),
+  KEY `form_id` (`form_id`),
+  KEY `user_submitted` (`user_id`,`submitted_at`,`id`),
+  CONSTRAINT `responses_archive_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `responses_archive_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `urgent_alerts`
+--
+ 
+DROP TABLE IF EXISTS `urgent_alerts`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `urgent_alerts` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `form_id` int NOT NULL,
+  `answer_id` int NOT NULL,
+  `score` decimal(4,3) NOT NULL,
+  `excerpt` varchar(280) NOT NULL,
+  `reasons` varchar(255) DEFAULT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `answer_id` (`answer_id`),
+  KEY `form_alert` (`form_id`,`id`),
+  CONSTRAINT `urgent_alerts_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `analysis_prewarm`
+--
+ 
+DROP TABLE IF EXISTS `analysis_prewarm`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `analysis_prewarm` (
+  `form_id` int NOT NULL,
+  `pending_since` timestamp NULL DEFAULT NULL,
+  `last_response_at` timestamp NULL DEFAULT NULL,
+  `last_warmed_at` timestamp NULL DEFAULT NULL,
+  `failures` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`form_id`),
+  KEY `pending_since` (`pending_since`),
+  CONSTRAINT `analysis_prewarm_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
+--
+-- Table structure for table `form_views`
+--
+ 
+DROP TABLE IF EXISTS `form_views`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `form_views` (
+  `form_id` int NOT NULL,
+  `view_date` date NOT NULL,
+  `views` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`form_id`,`view_date`),
+  KEY `view_date` (`view_date`),
+  CONSTRAINT `form_views_ibfk_1` FOREIGN KEY (`form_id`) REFERENCES `forms` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+ 
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
  
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
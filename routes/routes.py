@@ -1,12 +1,13 @@
 # routes/routes.py
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Importa os serviços que você já tem
-from services.language_service import extract_key_phrases 
+from services.language_service import extract_key_phrases, extract_key_phrases_batch, call_in_batches
 # Importa as funções de injeção de dependência do NOVO arquivo clients.py
 from clients import get_azure_client, get_gemini_model 
+from services import summary_cache
 
 import google.generativeai as genai
 import math # Para arredondamento das porcentagens
@@ -15,6 +16,10 @@ from concurrent.futures import ThreadPoolExecutor
 
 router = APIRouter()
 
+# Template do prompt de resumo. Faz parte da chave do cache de resumos:
+# alterar o texto invalida automaticamente os resumos antigos.
+SUMMARY_PROMPT_TEMPLATE = "Consolide e resuma os seguintes feedbacks em português, mantendo as informações mais importantes e o tom geral. Se houver poucas respostas, apenas reformule-as brevemente. Não adicione saudações ou frases introdutórias, vá direto ao resumo:\n\n{combined_text}"
+
 # Modelo Pydantic para requisições de texto, mantido para outras rotas se houver
 class TextRequest(BaseModel):
     text: str
@@ -46,7 +51,7 @@ def analyze_sentiment_batch(
         return {"positive": 0.0, "neutral": 0.0, "negative": 0.0}
 
     try:
-        response = ai_client.analyze_sentiment(documents=texts, language="pt")
+        response = call_in_batches(ai_client.analyze_sentiment, texts)
 
         positive_count = 0
         neutral_count = 0
@@ -82,6 +87,33 @@ def analyze_sentiment_batch(
             detail=f"Erro na análise de sentimento do Azure: {str(e)}"
         )
 
+# --- Rota para Sentimento por Texto (Azure AI Language) ---
+@router.post("/analyze/sentiment/labels", tags=["Analysis"])
+def classify_sentiment_batch(
+    texts: List[str],
+    ai_client = Depends(get_azure_client)
+) -> List[Optional[str]]:
+    """
+    Retorna o rótulo de sentimento (positive/neutral/negative) de cada texto, na mesma ordem.
+    Usado pelo Flask para alimentar os rollups de sentimento por período.
+    Textos com erro na Azure (ou rótulo 'mixed') voltam como None.
+    """
+    if not texts:
+        return []
+
+    try:
+        # Lotes de 10 (limite da Azure), mantendo a ordem dos textos
+        response = call_in_batches(ai_client.analyze_sentiment, texts)
+        return [
+            doc.sentiment if not doc.is_error and doc.sentiment in ("positive", "neutral", "negative") else None
+            for doc in response
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro na classificação de sentimento do Azure: {str(e)}"
+        )
+
 # --- Rota para Geração de Resumo (Google Gemini) ---
 @router.post("/generate/summary", tags=["Generation"])
 def generate_summary_for_flask(
@@ -94,15 +126,23 @@ def generate_summary_for_flask(
     if not texts:
         return {"summary_text": "Nenhum texto fornecido para resumo."}
 
+    # Mesmo conjunto de respostas + mesmo prompt + mesmo modelo => reaproveita o resumo
+    model_name = getattr(gemini_model, "model_name", "gemini")
+    cache_key = summary_cache.fingerprint(texts, SUMMARY_PROMPT_TEMPLATE, model_name)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        return {"summary_text": cached_summary}
+
     try:
         combined_text = "\n".join(texts)
         
-        prompt = f"Consolide e resuma os seguintes feedbacks em português, mantendo as informações mais importantes e o tom geral. Se houver poucas respostas, apenas reformule-as brevemente. Não adicione saudações ou frases introdutórias, vá direto ao resumo:\n\n{combined_text}"
+        prompt = SUMMARY_PROMPT_TEMPLATE.format(combined_text=combined_text)
 
         response = gemini_model.generate_content(prompt)
         
         if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
             summary_text = response.candidates[0].content.parts[0].text
+            summary_cache.put(cache_key, summary_text)
             return {"summary_text": summary_text}
         else:
             return {"summary_text": "Não foi possível gerar um resumo a partir dos feedbacks."}
@@ -137,13 +177,14 @@ async def analyze_full_batch(
     gemini_model: Any = Depends(get_gemini_model)
 ) -> Dict[str, Any]:
     """
-    Realiza a análise de Sentimento (Azure) e a Geração de Resumo (Gemini)
-    SIMULTANEAMENTE para uma lista de textos.
+    Realiza a análise de Sentimento (Azure), a Extração de Frases-Chave (Azure)
+    e a Geração de Resumo (Gemini) SIMULTANEAMENTE para uma lista de textos.
     """
     if not texts:
         return {
             "sentiment": {"positive": 0.0, "neutral": 0.0, "negative": 0.0},
-            "summary": {"summary_text": "Nenhum texto fornecido para análise."}
+            "summary": {"summary_text": "Nenhum texto fornecido para análise."},
+            "key_phrases": []
         }
 
     # 1. Empacota as chamadas síncronas para serem executadas em paralelo
@@ -165,18 +206,43 @@ async def analyze_full_batch(
         gemini_model
     )
     
+    # Chamada 3: Frases-Chave (usadas nos tópicos da visão de portfólio)
+    key_phrases_task = run_in_executor(
+        extract_key_phrases_batch,
+        texts,
+        ai_client
+    )
+    
     try:
-        # 2. Roda as duas tarefas em paralelo e espera o resultado da mais lenta
+        # 2. Roda as tarefas em paralelo e espera o resultado da mais lenta
         # O `await asyncio.gather(...)` é o comando que executa em paralelo.
-        sentiment_result, summary_result = await asyncio.gather(sentiment_task, summary_task)
+        sentiment_result, summary_result, key_phrases_result = await asyncio.gather(sentiment_task, summary_task, key_phrases_task)
         
         return {
             "sentiment": sentiment_result,
-            "summary": summary_result
+            "summary": summary_result,
+            # Frases-chave são complementares: se a Azure falhar nelas, não derruba a análise
+            "key_phrases": key_phrases_result.get("key_phrases", [])
         }
     
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erro durante a execução paralela das análises: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# --- Cache de Resumos ---
+@router.get("/cache/summary", tags=["Cache"])
+def summary_cache_stats() -> Dict[str, Any]:
+    """
+    Estatísticas do cache de resumos deste processo (itens em memória, hits e misses).
+    """
+    return summary_cache.stats()
+
+@router.delete("/cache/summary", tags=["Cache"])
+def summary_cache_clear() -> Dict[str, bool]:
+    """
+    Invalida todo o cache de resumos (memória deste processo e arquivos em disco).
+    """
+    summary_cache.clear()
+    return {"cleared": True}
@@ -0,0 +1,180 @@
+# services/archive.py
+"""
+Retenção: move as respostas de formulários arquivados (campanhas encerradas)
+das tabelas quentes `responses`/`answers` para `responses_archive`/`answers_archive`
+(InnoDB comprimido). Rollups e analysis_cache NÃO são tocados, então dashboard,
+tendências e análises continuam disponíveis.
+
+Usamos tabelas de arquivo em vez de PARTITION BY RANGE porque o MySQL não
+permite chaves estrangeiras em tabelas particionadas.
+
+Enquanto as respostas estão sendo movidas (forms.archive_move preenchido), as
+leituras enxergam os dois pares de tabelas; archived_at só muda na mesma
+transação do último lote. Se um lote falhar, nada some: basta rodar de novo.
+"""
+from typing import Dict, Any, List, Tuple, Callable
+
+# Quantas respostas são movidas por transação
+ARCHIVE_BATCH_SIZE = 5000
+
+HOT_TABLES = ('responses', 'answers')
+ARCHIVE_TABLES = ('responses_archive', 'answers_archive')
+
+ANSWER_COLUMNS = "id, response_id, question_id, answer_text, option_id, sentiment, urgency_score"
+RESPONSE_COLUMNS = "id, form_id, user_id, submitted_at, imported"
+
+
+def tables_for(form: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Retorna (tabela de respostas, tabela de answers) onde estão os dados do formulário.
+    Durante a movimentação devolve a união das duas (use sempre com alias: `FROM {t} r`).
+    """
+    if form.get('archive_move'):
+        return (
+            f"(SELECT {RESPONSE_COLUMNS} FROM responses UNION ALL SELECT {RESPONSE_COLUMNS} FROM responses_archive)",
+            f"(SELECT {ANSWER_COLUMNS} FROM answers UNION ALL SELECT {ANSWER_COLUMNS} FROM answers_archive)",
+        )
+    return ARCHIVE_TABLES if form.get('archived_at') else HOT_TABLES
+
+
+def is_closed(form: Dict[str, Any]) -> bool:
+    """Formulário arquivado (ou sendo movido) não aceita respostas nem edição de perguntas."""
+    return bool(form.get('archived_at') or form.get('archive_move'))
+
+
+def lock_open_form(cursor, form_id: int) -> bool:
+    """
+    Confere, dentro da transação de envio, que o formulário ainda aceita respostas
+    e segura um lock compartilhado na linha de forms até o commit: o UPDATE que
+    inicia o arquivamento espera o envio terminar, e a resposta entra nos lotes.
+    """
+    cursor.execute("""
+        SELECT 1 FROM forms
+        WHERE id = %s AND archived_at IS NULL AND archive_move IS NULL
+        FOR SHARE
+    """, (form_id,))
+    return cursor.fetchone() is not None
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _move(conn, form_id: int, source: Tuple[str, str], target: Tuple[str, str],
+          finish: Callable[[Any], None]) -> int:
+    """
+    Move as respostas (e answers) de um formulário entre os pares de tabelas, em lotes.
+    `finish(cursor)` roda na mesma transação do último lote (ou sozinho, se não sobrou nada).
+    """
+    src_responses, src_answers = source
+    dst_responses, dst_answers = target
+    cursor = conn.cursor()
+    moved = 0
+
+    while True:
+        cursor.execute(
+            f"SELECT id FROM {src_responses} WHERE form_id = %s ORDER BY id LIMIT %s",
+            (form_id, ARCHIVE_BATCH_SIZE + 1)
+        )
+        ids: List[int] = [row[0] for row in cursor.fetchall()]
+        last_batch = len(ids) <= ARCHIVE_BATCH_SIZE
+        ids = ids[:ARCHIVE_BATCH_SIZE]
+
+        in_ids = _placeholders(ids)
+        try:
+            if ids:
+                cursor.execute(f"""
+                    INSERT INTO {dst_responses} ({RESPONSE_COLUMNS})
+                    SELECT {RESPONSE_COLUMNS} FROM {src_responses} WHERE id IN ({in_ids})
+                """, tuple(ids))
+                cursor.execute(f"""
+                    INSERT INTO {dst_answers} ({ANSWER_COLUMNS})
+                    SELECT {ANSWER_COLUMNS} FROM {src_answers} WHERE response_id IN ({in_ids})
+                """, tuple(ids))
+                # answers da origem saem junto (ON DELETE CASCADE)
+                cursor.execute(f"DELETE FROM {src_answers} WHERE response_id IN ({in_ids})", tuple(ids))
+                cursor.execute(f"DELETE FROM {src_responses} WHERE id IN ({in_ids})", tuple(ids))
+            if last_batch:
+                finish(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        moved += len(ids)
+        if last_batch:
+            return moved
+
+
+def _start_move(conn, form_id: int, direction: str, where: str) -> bool:
+    """Marca o início (ou a retomada) da movimentação. False se o formulário não está no estado esperado."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        UPDATE forms SET archive_move = %s
+        WHERE id = %s AND (archive_move = %s OR (archive_move IS NULL AND {where}))
+    """, (direction, form_id, direction))
+    conn.commit()
+    cursor.execute("SELECT archive_move FROM forms WHERE id = %s", (form_id,))
+    row = cursor.fetchone()
+    return bool(row) and row[0] == direction
+
+
+def archive_form(conn, form_id: int) -> int:
+    """
+    Arquiva o formulário: move as respostas para o arquivo e marca archived_at
+    junto com o último lote. Faz commit a cada lote. Retorna quantas respostas foram movidas.
+    """
+    # A partir daqui o submit_form recusa respostas e as leituras usam os dois pares
+    if not _start_move(conn, form_id, 'archiving', "archived_at IS NULL"):
+        return 0
+
+    def finish(cursor):
+        cursor.execute("UPDATE forms SET archived_at = NOW(), archive_move = NULL WHERE id = %s", (form_id,))
+
+    return _move(conn, form_id, HOT_TABLES, ARCHIVE_TABLES, finish)
+
+
+def drop_orphan_option_answers(conn, form_id: int) -> int:
+    """
+    answers_archive não tem FK de option_id: respostas que apontam para opções
+    que não existem mais não podem voltar para `answers` e são descartadas.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE aa FROM answers_archive aa
+        JOIN responses_archive ra ON aa.response_id = ra.id
+        LEFT JOIN question_options qo ON aa.option_id = qo.id
+        WHERE ra.form_id = %s AND aa.option_id IS NOT NULL AND qo.id IS NULL
+    """, (form_id,))
+    conn.commit()
+    return cursor.rowcount
+
+
+def restore_form(conn, form_id: int) -> int:
+    """Desfaz o arquivamento: devolve as respostas às tabelas quentes."""
+    if not _start_move(conn, form_id, 'restoring', "archived_at IS NOT NULL"):
+        return 0
+    dropped = drop_orphan_option_answers(conn, form_id)
+    if dropped:
+        print(f"Formulário {form_id}: {dropped} resposta(s) de opções removidas descartadas na restauração.")
+
+    def finish(cursor):
+        cursor.execute("UPDATE forms SET archived_at = NULL, archive_move = NULL WHERE id = %s", (form_id,))
+
+    return _move(conn, form_id, ARCHIVE_TABLES, HOT_TABLES, finish)
+
+
+def find_inactive_forms(cursor, days: int) -> List[int]:
+    """
+    Formulários ativos cuja última resposta (ou criação) é mais antiga que `days`
+    dias, mais os arquivamentos que pararam no meio (para retomar).
+    """
+    cursor.execute("""
+        SELECT f.id
+        FROM forms f
+        LEFT JOIN responses r ON r.form_id = f.id
+        WHERE f.archived_at IS NULL
+        GROUP BY f.id, f.archive_move
+        HAVING f.archive_move = 'archiving'
+            OR (f.archive_move IS NULL AND COALESCE(MAX(r.submitted_at), MAX(f.created_at)) < NOW() - INTERVAL %s DAY)
+    """, (days,))
+    return [row[0] if isinstance(row, tuple) else row['id'] for row in cursor.fetchall()]
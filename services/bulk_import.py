@@ -0,0 +1,285 @@
+# services/bulk_import.py
+"""
+Importação em massa de respostas históricas (CSV ou JSONL) para um formulário.
+
+As linhas são lidas e validadas em streaming (nada é carregado inteiro na
+memória) e gravadas em lotes: cada lote de IMPORT_BATCH_SIZE respostas é uma
+transação, com as respostas e os answers inseridos via INSERT de várias
+linhas (poucas idas ao banco por lote). Rollups são recalculados uma única vez
+no fim; o analysis_cache fica desatualizado pela contagem de respostas e é
+regenerado pelo processo de pré-aquecimento ou na próxima visualização.
+
+Mapeamento de colunas -> perguntas:
+  - explícito: {"coluna": question_id, ...}
+  - automático: coluna com o mesmo texto da pergunta (sem diferenciar
+    maiúsculas) ou no formato "q_<id>"
+Coluna opcional "submitted_at" (ISO 8601) guarda a data original da resposta.
+Em CSV, várias opções de checkbox vão separadas por ";". Em JSONL, pode ser lista.
+"""
+import csv
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Callable, TextIO, Tuple
+
+from services import rollups
+from services import prewarm
+
+IMPORT_BATCH_SIZE = 1000
+ANSWER_INSERT_CHUNK = 5000
+CHECKBOX_SEPARATOR = ";"
+SUBMITTED_AT_COLUMN = "submitted_at"
+MAX_REPORTED_ERRORS = 100
+# Onde o csv.DictReader guarda os campos que sobram além do cabeçalho
+EXTRA_FIELDS_KEY = "__extra_fields__"
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Any]:
+    """
+    Lê as linhas do arquivo uma a uma. fmt: 'csv' ou 'jsonl'.
+    Linhas JSONL ilegíveis saem como ValueError (em vez de interromper a leitura).
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream, restkey=EXTRA_FIELDS_KEY)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"JSON inválido ({e})")
+                continue
+            yield row if isinstance(row, dict) else ValueError("cada linha deve ser um objeto JSON")
+    else:
+        raise ValueError("formato deve ser 'csv' ou 'jsonl'")
+
+
+def build_mapping(questions: List[Dict[str, Any]], columns: List[str],
+                  mapping: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    """Retorna {coluna: pergunta}. Levanta ValueError se o mapeamento citar pergunta inexistente."""
+    by_id = {q['id']: q for q in questions}
+    if mapping:
+        result = {}
+        for column, question_id in mapping.items():
+            if int(question_id) not in by_id:
+                raise ValueError(f"coluna '{column}': pergunta {question_id} não pertence ao formulário")
+            result[column] = by_id[int(question_id)]
+        return result
+
+    by_text = {q['question_text'].strip().casefold(): q for q in questions}
+    result = {}
+    for column in columns:
+        if not isinstance(column, str):
+            continue
+        key = column.strip()
+        if key.startswith("q_") and key[2:].isdigit() and int(key[2:]) in by_id:
+            result[column] = by_id[int(key[2:])]
+        elif key.casefold() in by_text:
+            result[column] = by_text[key.casefold()]
+    return result
+
+
+def _option_ids(question: Dict[str, Any], value: Any) -> List[int]:
+    """Converte o valor da célula (texto da opção ou id) nos ids de opção."""
+    if isinstance(value, list):
+        values = value
+    elif question['question_type'] == 'checkbox':
+        values = str(value).split(CHECKBOX_SEPARATOR)
+    else:
+        values = [value]
+
+    by_text = {o['option_text'].strip().casefold(): o['id'] for o in question['options']}
+    valid_ids = set(by_text.values())
+    ids = []
+    for v in values:
+        v = str(v).strip()
+        if not v:
+            continue
+        if v.casefold() in by_text:
+            ids.append(by_text[v.casefold()])
+        elif v.isdigit() and int(v) in valid_ids:
+            ids.append(int(v))
+        else:
+            raise ValueError(f"'{v}' não é uma opção da pergunta {question['id']}")
+    if question['question_type'] == 'multiple_choice' and len(ids) > 1:
+        raise ValueError(f"pergunta {question['id']} aceita só uma opção")
+    return ids
+
+
+def parse_row(row: Dict[str, Any], mapping: Dict[str, Dict[str, Any]],
+              questions: List[Dict[str, Any]]) -> Tuple[Optional[datetime], List[Tuple[int, Optional[str], Optional[int]]]]:
+    """
+    Valida uma linha e devolve (submitted_at, [(question_id, answer_text, option_id), ...]).
+    Levanta ValueError com a mensagem do problema.
+    """
+    submitted_at = None
+    if row.get(SUBMITTED_AT_COLUMN):
+        try:
+            submitted_at = datetime.fromisoformat(str(row[SUBMITTED_AT_COLUMN]).strip())
+        except ValueError:
+            raise ValueError(f"submitted_at inválido: '{row[SUBMITTED_AT_COLUMN]}'")
+
+    answers = []
+    answered = set()
+    for column, question in mapping.items():
+        value = row.get(column)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if question['question_type'] == 'text':
+            answers.append((question['id'], str(value), None))
+        else:
+            for option_id in _option_ids(question, value):
+                answers.append((question['id'], None, option_id))
+        answered.add(question['id'])
+
+    missing = [q['id'] for q in questions if q['is_required'] and q['id'] not in answered]
+    if missing:
+        raise ValueError(f"perguntas obrigatórias sem resposta: {missing}")
+    if not answers:
+        raise ValueError("linha sem nenhuma resposta")
+    return submitted_at, answers
+
+
+def _flush(conn, form_id: int, batch: List[Tuple[Optional[datetime], list]]) -> int:
+    """Grava um lote de respostas em uma transação. Retorna quantos answers foram gravados."""
+    cursor = conn.cursor()
+    try:
+        # Um único INSERT de várias linhas para as respostas do lote. É um "simple
+        # insert" para o InnoDB, que reserva os ids consecutivos de uma vez: o
+        # primeiro é o LAST_INSERT_ID() e os demais seguem a ordem do VALUES.
+        cursor.execute(
+            "INSERT INTO responses (form_id, user_id, submitted_at, imported) VALUES "
+            + ", ".join(["(%s, NULL, COALESCE(%s, NOW()), 1)"] * len(batch)),
+            tuple(value for submitted_at, _ in batch for value in (form_id, submitted_at))
+        )
+        cursor.execute("SELECT LAST_INSERT_ID()")
+        first_id = cursor.fetchone()[0]
+
+        # Confere que os ids realmente são consecutivos antes de amarrar os answers a eles
+        cursor.execute(
+            "SELECT COUNT(*) FROM responses WHERE id BETWEEN %s AND %s AND form_id = %s",
+            (first_id, first_id + len(batch) - 1, form_id)
+        )
+        if cursor.fetchone()[0] != len(batch):
+            raise RuntimeError("ids das respostas importadas não são consecutivos")
+
+        answer_rows = [
+            (first_id + offset, qid, text, option_id)
+            for offset, (_, answers) in enumerate(batch)
+            for qid, text, option_id in answers
+        ]
+        for start in range(0, len(answer_rows), ANSWER_INSERT_CHUNK):
+            # executemany de INSERT ... VALUES vira um único INSERT de várias linhas
+            cursor.executemany(
+                "INSERT INTO answers (response_id, question_id, answer_text, option_id) VALUES (%s, %s, %s, %s)",
+                answer_rows[start:start + ANSWER_INSERT_CHUNK]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(answer_rows)
+
+
+def _finalize(conn, form_id: int):
+    """Recalcula os rollups uma vez só, no fim, e marca a análise para pré-aquecimento."""
+    try:
+        cursor = conn.cursor()
+        rollups.rebuild_rollups(cursor, form_id)
+        prewarm.mark_pending(cursor, form_id)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao finalizar importação do formulário {form_id}: {e}")
+
+
+def run_import(conn, form: Dict[str, Any], questions: List[Dict[str, Any]],
+               stream: TextIO, fmt: str,
+               mapping: Optional[Dict[str, int]] = None,
+               dry_run: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Importa as respostas do `stream` para o formulário, devolvendo o relatório
+    parcial a cada lote gravado; o último item tem "finished": True. Linhas
+    inválidas são puladas e listadas no relatório (até MAX_REPORTED_ERRORS).
+    """
+    report = {
+        "form_id": form['id'],
+        "rows_read": 0,
+        "responses_imported": 0,
+        "answers_imported": 0,
+        "rows_skipped": 0,
+        "errors": [],
+        "dry_run": dry_run,
+        "finished": False,
+    }
+
+    rows = iter_rows(stream, fmt)
+    # CSV tem as mesmas colunas em todas as linhas; em JSONL as chaves podem variar
+    mappings_by_columns: Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]] = {}
+    batch = []
+
+    def skip(row_no: int, message: str):
+        report['rows_skipped'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({"row": row_no, "error": message})
+
+    def flush():
+        if not dry_run:
+            report['answers_imported'] += _flush(conn, form['id'], batch)
+        else:
+            report['answers_imported'] += sum(len(answers) for _, answers in batch)
+        report['responses_imported'] += len(batch)
+        batch.clear()
+
+    try:
+        for row_no, row in enumerate(rows, start=1):
+            report['rows_read'] = row_no
+            if isinstance(row, ValueError):
+                skip(row_no, str(row))
+                continue
+            if EXTRA_FIELDS_KEY in row:
+                skip(row_no, f"linha com {len(row[EXTRA_FIELDS_KEY])} campo(s) a mais que o cabeçalho")
+                continue
+
+            columns = tuple(row.keys())
+            if columns not in mappings_by_columns:
+                mappings_by_columns[columns] = build_mapping(questions, list(columns), mapping)
+                if fmt == 'csv' and not mappings_by_columns[columns]:
+                    raise ValueError("nenhuma coluna do arquivo corresponde a perguntas do formulário")
+                report.setdefault('mapping', {}).update(
+                    {column: q['id'] for column, q in mappings_by_columns[columns].items()}
+                )
+
+            try:
+                batch.append(parse_row(row, mappings_by_columns[columns], questions))
+            except ValueError as e:
+                skip(row_no, str(e))
+                continue
+
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+                yield dict(report)
+
+        if batch:
+            flush()
+    finally:
+        # Roda também quando o import para no meio: os lotes já gravados
+        # precisam aparecer nos totais, tendências e no pré-aquecimento
+        if not dry_run and report['responses_imported']:
+            _finalize(conn, form['id'])
+
+    report['finished'] = True
+    yield report
+
+
+def import_responses(conn, form: Dict[str, Any], questions: List[Dict[str, Any]],
+                     stream: TextIO, fmt: str,
+                     mapping: Optional[Dict[str, int]] = None,
+                     dry_run: bool = False,
+                     progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Versão "bloqueante" de run_import: chama `progress` a cada lote e retorna o relatório final."""
+    for report in run_import(conn, form, questions, stream, fmt, mapping, dry_run):
+        if report['finished']:
+            return report
+        if progress:
+            progress(report)
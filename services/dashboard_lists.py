@@ -0,0 +1,162 @@
+# services/dashboard_lists.py
+"""
+Listas do dashboard ("Meus formulários" e "Formulários que respondi") em
+páginas de tamanho fixo, com paginação por keyset (continua a partir do
+último item visto, sem OFFSET) e só as colunas que os cards mostram.
+
+Ordenações e busca usam colunas indexadas:
+  forms(user_id, created_at, id), forms(user_id, title, id)
+  responses(user_id, submitted_at, id) e o mesmo no arquivo
+"""
+import base64
+import json
+from typing import List, Dict, Any, Optional, Tuple
+
+DASHBOARD_PAGE_SIZE = 20
+DESCRIPTION_PREVIEW = 200
+
+CREATED_SORTS = {
+    # sort: (coluna, direção)
+    'newest': ('created_at', 'DESC'),
+    'oldest': ('created_at', 'ASC'),
+    'title': ('title', 'ASC'),
+}
+ANSWERED_SORTS = {
+    'newest': 'DESC',
+    'oldest': 'ASC',
+}
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    """Cursor opaco para a URL: (valor da coluna de ordenação, id)."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat(sep=' ')
+    raw = json.dumps([value, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, int]]:
+    """Levanta ValueError se o cursor vier adulterado."""
+    if not cursor:
+        return None
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return value, int(row_id)
+    except Exception:
+        raise ValueError("cursor inválido")
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def fetch_created_page(cursor, user_id: int, search: str = '', sort: str = 'newest',
+                       after: Optional[str] = None,
+                       page_size: int = DASHBOARD_PAGE_SIZE) -> Dict[str, Any]:
+    """Uma página dos formulários criados pelo usuário."""
+    column, direction = CREATED_SORTS.get(sort, CREATED_SORTS['newest'])
+    where = ["user_id = %s"]
+    params: List[Any] = [user_id]
+
+    if search:
+        # Busca por prefixo do título: aproveita o índice (user_id, title)
+        where.append("title LIKE %s")
+        params.append(_escape_like(search) + '%')
+
+    position = decode_cursor(after)
+    if position:
+        op = '<' if direction == 'DESC' else '>'
+        where.append(f"({column}, id) {op} (%s, %s)")
+        params.extend(position)
+
+    cursor.execute(f"""
+        SELECT id, title, LEFT(description, {DESCRIPTION_PREVIEW}) AS description, created_at, archived_at
+        FROM forms
+        WHERE {' AND '.join(where)}
+        ORDER BY {column} {direction}, id {direction}
+        LIMIT %s
+    """, (*params, page_size + 1))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1][column], rows[-1]['id']) if has_more else None,
+    }
+
+
+def fetch_answered_page(cursor, user_id: int, search: str = '', sort: str = 'newest',
+                        after: Optional[str] = None,
+                        page_size: int = DASHBOARD_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Uma página das respostas enviadas pelo usuário (tabela quente + arquivo),
+    cada uma com os dados do formulário respondido.
+    """
+    direction = ANSWERED_SORTS.get(sort, 'DESC')
+    op = '<' if direction == 'DESC' else '>'
+    position = decode_cursor(after)
+
+    where = ["r.user_id = %s"]
+    params: List[Any] = [user_id]
+    if search:
+        where.append("f.title LIKE %s")
+        params.append(_escape_like(search) + '%')
+    if position:
+        where.append(f"(r.submitted_at, r.id) {op} (%s, %s)")
+        params.extend(position)
+    where_sql = ' AND '.join(where)
+
+    # Cada lado do UNION já vem ordenado e limitado pelo índice (user_id, submitted_at, id)
+    select = f"""
+        SELECT r.id AS response_id, r.submitted_at, f.id, f.title,
+               LEFT(f.description, {DESCRIPTION_PREVIEW}) AS description
+        FROM {{table}} r
+        JOIN forms f ON r.form_id = f.id
+        WHERE {where_sql}
+        ORDER BY r.submitted_at {direction}, r.id {direction}
+        LIMIT %s
+    """
+    cursor.execute(f"""
+        SELECT * FROM (
+            ({select.format(table='responses')})
+            UNION ALL
+            ({select.format(table='responses_archive')})
+        ) AS answered
+        ORDER BY submitted_at {direction}, response_id {direction}
+        LIMIT %s
+    """, (*params, page_size + 1, *params, page_size + 1, page_size + 1))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1]['submitted_at'], rows[-1]['response_id']) if has_more else None,
+    }
+
+
+def fetch_dashboard_counts(cursor, user_id: int) -> Dict[str, int]:
+    """Totais do dashboard com COUNTs indexados (sem carregar as listas)."""
+    cursor.execute("SELECT COUNT(*) AS total FROM forms WHERE user_id = %s", (user_id,))
+    total_forms = cursor.fetchone()['total']
+
+    cursor.execute("""
+        SELECT COALESCE(SUM(rr.response_count), 0) AS total
+        FROM response_rollups rr
+        JOIN forms f ON rr.form_id = f.id
+        WHERE f.user_id = %s AND rr.granularity = 'month'
+    """, (user_id,))
+    total_responses = int(cursor.fetchone()['total'])
+
+    cursor.execute("""
+        SELECT (SELECT COUNT(*) FROM responses WHERE user_id = %s)
+             + (SELECT COUNT(*) FROM responses_archive WHERE user_id = %s) AS total
+    """, (user_id, user_id))
+    answered = cursor.fetchone()['total']
+
+    return {
+        "total_forms": total_forms,
+        "total_responses": total_responses,
+        "forms_answered_count": answered,
+    }
@@ -1,3 +1,25 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# A Azure aceita no máximo 10 documentos por chamada síncrona
+AZURE_BATCH_SIZE = 10
+# Quantos lotes de 10 podem ir para a Azure ao mesmo tempo
+AZURE_MAX_CONCURRENCY = 5
+# Frases-chave saem de uma amostra: 200 textos = 20 chamadas, 4 rodadas paralelas
+KEY_PHRASES_SAMPLE_SIZE = 200
+
+def call_in_batches(method, texts):
+    """
+    Chama `method` (ex.: client.analyze_sentiment) em lotes de AZURE_BATCH_SIZE,
+    alguns em paralelo, e devolve os documentos na mesma ordem dos textos.
+    """
+    batches = [texts[start:start + AZURE_BATCH_SIZE] for start in range(0, len(texts), AZURE_BATCH_SIZE)]
+    if not batches:
+        return []
+    with ThreadPoolExecutor(max_workers=min(AZURE_MAX_CONCURRENCY, len(batches))) as pool:
+        results = pool.map(lambda batch: list(method(documents=batch, language="pt")), batches)
+        return [doc for batch in results for doc in batch]
+
 def analyze_sentiment(client, text: str): # <--- AGORA RECEBE O CLIENTE
     """
     Analisa o sentimento (positivo, negativo, neutro) do texto.
@@ -21,4 +43,20 @@ def extract_key_phrases(client, text: str): # <--- AGORA RECEBE O CLIENTE
         response = client.extract_key_phrases(documents=[text])[0]
         return {"key_phrases": response.key_phrases}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+def extract_key_phrases_batch(client, texts, top_n: int = 10, sample_size: int = KEY_PHRASES_SAMPLE_SIZE):
+    """
+    Extrai as frases-chave dos textos e retorna as mais frequentes:
+    [{"phrase": ..., "count": ...}]. Usa só os `sample_size` textos mais recentes
+    (o fim da lista), em lotes paralelos, para caber no tempo da análise completa.
+    """
+    counts = Counter()
+    try:
+        for doc in call_in_batches(client.extract_key_phrases, texts[-sample_size:]):
+            if not doc.is_error:
+                # Conta cada frase uma vez por texto, sem diferenciar maiúsculas
+                counts.update({phrase.lower() for phrase in doc.key_phrases})
+        return {"key_phrases": [{"phrase": phrase, "count": count} for phrase, count in counts.most_common(top_n)]}
+    except Exception as e:
+        return {"error": str(e)}
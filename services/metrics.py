@@ -0,0 +1,23 @@
+# services/metrics.py
+"""
+Contadores simples em memória (por processo) para acompanhar cache e
+regeneração de análises. Expostos pelo Flask em /api/metrics.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_counters: Dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def incr(name: str, amount: int = 1):
+    """Soma `amount` ao contador `name`."""
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot() -> Dict[str, int]:
+    """Cópia dos contadores atuais."""
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,136 @@
+# services/portfolio.py
+"""
+Visão de portfólio: consolida vários formulários de uma vez, lendo apenas
+o que já está pré-calculado (rollups + analysis_cache). Nenhuma análise de
+formulário é refeita aqui; forms sem cache atualizado só são sinalizados.
+"""
+import json
+from collections import Counter, defaultdict
+from typing import List, Dict, Any
+
+from services.rollups import SENTIMENT_LABELS
+
+# Quantas frases-chave entram no ranking consolidado
+PORTFOLIO_TOP_PHRASES = 15
+
+# Textos que a análise grava no lugar do resumo quando não há o que resumir
+# (ou a IA falhou); não são resumos e não vão para o portfólio nem para o Gemini
+PLACEHOLDER_SUMMARIES = {
+    "Sem dados",
+    "Sem respostas suficientes para análise.",
+    "Nenhum texto fornecido para resumo.",
+    "Nenhum texto fornecido para análise.",
+    "Não foi possível gerar um resumo a partir dos feedbacks.",
+}
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _json(value, default):
+    """JSON_EXTRACT volta como str/bytes (ou None quando o caminho não existe)."""
+    if value is None:
+        return default
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _is_summary(text) -> bool:
+    return bool(text) and text.strip() not in PLACEHOLDER_SUMMARIES and not text.startswith('ERRO')
+
+
+def _percentages(counts: Dict[str, int]) -> Dict[str, float]:
+    total = sum(counts.values())
+    return {label: round((counts[label] / total) * 100, 1) if total else 0.0 for label in SENTIMENT_LABELS}
+
+
+def build_portfolio(cursor, forms: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Monta o portfólio dos `forms` (dicts com id e title) com 3 consultas em lote,
+    independente da quantidade de formulários.
+    """
+    portfolio = {
+        "form_count": len(forms),
+        "total_responses": 0,
+        "sentiment": {"counts": {label: 0 for label in SENTIMENT_LABELS}, "percentages": _percentages({label: 0 for label in SENTIMENT_LABELS})},
+        "top_phrases": [],
+        "forms": [],
+        "stale_form_ids": [],
+    }
+    if not forms:
+        return portfolio
+
+    form_ids = [f['id'] for f in forms]
+    in_forms = _placeholders(form_ids)
+
+    # 1. Volume por formulário (rollup mensal = total histórico)
+    cursor.execute(f"""
+        SELECT form_id, SUM(response_count) AS total
+        FROM response_rollups
+        WHERE form_id IN ({in_forms}) AND granularity = 'month'
+        GROUP BY form_id
+    """, tuple(form_ids))
+    volume = {row['form_id']: int(row['total']) for row in cursor.fetchall()}
+
+    # 2. Sentimento por formulário (rollup mensal)
+    cursor.execute(f"""
+        SELECT form_id, SUM(positive) AS positive, SUM(neutral) AS neutral, SUM(negative) AS negative
+        FROM sentiment_rollups
+        WHERE form_id IN ({in_forms}) AND granularity = 'month'
+        GROUP BY form_id
+    """, tuple(form_ids))
+    sentiment = {row['form_id']: {label: int(row[label]) for label in SENTIMENT_LABELS} for row in cursor.fetchall()}
+
+    # 3. Resumos e frases-chave já gerados (só os trechos do JSON, não o blob inteiro)
+    cursor.execute(f"""
+        SELECT form_id, response_count,
+               JSON_EXTRACT(analysis_data, '$.questions_analysis[*].analysis_data.summary_text') AS summaries,
+               JSON_EXTRACT(analysis_data, '$.questions_analysis[*].analysis_data.key_phrases') AS key_phrases
+        FROM analysis_cache
+        WHERE form_id IN ({in_forms})
+    """, tuple(form_ids))
+    cached = {row['form_id']: row for row in cursor.fetchall()}
+
+    totals = Counter()
+    phrase_counts = Counter()
+    phrase_forms = defaultdict(set)
+
+    for form in forms:
+        fid = form['id']
+        counts = sentiment.get(fid, {label: 0 for label in SENTIMENT_LABELS})
+        row = cached.get(fid)
+        pending = not row or row['response_count'] != volume.get(fid, 0)
+
+        totals.update(counts)
+        portfolio['total_responses'] += volume.get(fid, 0)
+        if pending:
+            portfolio['stale_form_ids'].append(fid)
+
+        summaries = []
+        if row:
+            summaries = [text for text in _json(row['summaries'], []) if _is_summary(text)]
+            for phrases in _json(row['key_phrases'], []):
+                for item in phrases or []:
+                    phrase_counts[item['phrase']] += item['count']
+                    phrase_forms[item['phrase']].add(fid)
+
+        portfolio['forms'].append({
+            "form_id": fid,
+            "form_title": form['title'],
+            "total_responses": volume.get(fid, 0),
+            "sentiment": _percentages(counts),
+            "summaries": summaries,
+            "analysis_pending": pending,
+        })
+
+    portfolio['sentiment'] = {
+        "counts": {label: totals[label] for label in SENTIMENT_LABELS},
+        "percentages": _percentages(totals),
+    }
+    portfolio['top_phrases'] = [
+        {"phrase": phrase, "count": count, "form_count": len(phrase_forms[phrase])}
+        for phrase, count in phrase_counts.most_common(PORTFOLIO_TOP_PHRASES)
+    ]
+    return portfolio
@@ -0,0 +1,314 @@
+# services/prewarm.py
+"""
+Pré-aquecimento das análises: um processo separado (flask prewarm-analyses)
+regenera em segundo plano a análise dos formulários que receberam respostas
+novas, para que a página de resultados quase sempre encontre o cache em dia.
+
+- submit_form / importação marcam o formulário em analysis_prewarm
+- a API da análise conta as visualizações em memória e grava os totais em
+  form_views a cada VIEW_FLUSH_INTERVAL segundos; os formulários mais vistos
+  nos últimos dias são aquecidos primeiro
+- só roda dentro das janelas de horário configuradas (PREWARM_WINDOWS)
+- no máximo PREWARM_CONCURRENCY análises ao mesmo tempo
+- orçamento de chamadas à IA por hora (Azure + Gemini) e pausa progressiva
+  quando o provedor falha, para não disputar cota com os usuários
+
+Não depende do Flask: recebe `connect()` (nova conexão) e `warm(conn, form)`,
+que devolve 'warmed', 'fresh' (já estava em dia), 'busy' (outro worker está
+gerando) ou 'failed'.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime
+from typing import List, Dict, Any, Optional, Callable, Tuple, Deque
+
+from services import metrics
+from services.language_service import AZURE_BATCH_SIZE, KEY_PHRASES_SAMPLE_SIZE
+
+# Janelas "HH:MM-HH:MM" separadas por vírgula (podem virar a meia-noite); vazio = sempre
+PREWARM_WINDOWS = os.getenv("PREWARM_WINDOWS", "")
+PREWARM_INTERVAL = int(os.getenv("PREWARM_INTERVAL", "60"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+PREWARM_AI_CALLS_PER_HOUR = int(os.getenv("PREWARM_AI_CALLS_PER_HOUR", "200"))
+
+# Espera a rajada de respostas acalmar, mas não deixa o cache velho por mais que MAX_DELAY
+PREWARM_SETTLE_SECONDS = 60
+PREWARM_MAX_DELAY = 15 * 60
+# Prioridade: visualizações dos últimos N dias (as de hoje pesam mais)
+PREWARM_VIEW_DAYS = 7
+PREWARM_MIN_VIEWS = int(os.getenv("PREWARM_MIN_VIEWS", "1"))
+PREWARM_BATCH = 50
+PREWARM_MAX_FAILURES = 3
+PREWARM_BACKOFF_MIN = 60
+PREWARM_BACKOFF_MAX = 30 * 60
+
+# Chamadas ao Gemini por pergunta de texto (o resumo)
+SUMMARY_CALLS_PER_QUESTION = 1
+
+# Visualizações acumuladas em memória até o próximo flush
+VIEW_FLUSH_INTERVAL = 60
+
+_views: Counter = Counter()
+_views_lock = threading.Lock()
+_last_views_flush = time.monotonic()
+
+_spent: Deque[Tuple[float, int]] = deque()
+_budget_lock = threading.Lock()
+_backoff = 0
+_backoff_until = 0.0
+
+
+def parse_windows(spec: str) -> List[Tuple[dtime, dtime]]:
+    """'22:00-06:00,12:00-13:30' -> [(22:00, 06:00), (12:00, 13:30)]. Levanta ValueError."""
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        try:
+            start, end = (dtime.fromisoformat(t.strip()) for t in part.split("-"))
+        except ValueError:
+            raise ValueError(f"janela inválida: '{part}' (use HH:MM-HH:MM)")
+        windows.append((start, end))
+    return windows
+
+
+def in_window(windows: List[Tuple[dtime, dtime]], now: dtime) -> bool:
+    if not windows:
+        return True
+    for start, end in windows:
+        if start <= end and start <= now < end:
+            return True
+        if start > end and (now >= start or now < end):
+            return True
+    return False
+
+
+def mark_pending(cursor, form_id: int):
+    """Marca o formulário como tendo respostas novas. Não faz commit (entra na transação da resposta)."""
+    cursor.execute("""
+        INSERT INTO analysis_prewarm (form_id, pending_since, last_response_at) VALUES (%s, NOW(), NOW())
+        ON DUPLICATE KEY UPDATE
+            pending_since = COALESCE(analysis_prewarm.pending_since, NOW()),
+            last_response_at = NOW(),
+            failures = 0
+    """, (form_id,))
+
+
+def count_view(form_id: int):
+    """Conta uma visualização da análise só em memória (sem tocar no banco)."""
+    with _views_lock:
+        _views[form_id] += 1
+
+
+def flush_views(cursor, force: bool = False) -> bool:
+    """
+    Grava as visualizações acumuladas em form_views, no máximo uma vez a cada
+    VIEW_FLUSH_INTERVAL segundos. Retorna True se escreveu (quem chama faz o commit).
+    """
+    global _views, _last_views_flush
+    with _views_lock:
+        if not _views or (not force and time.monotonic() - _last_views_flush < VIEW_FLUSH_INTERVAL):
+            return False
+        pending, _views = _views, Counter()
+        _last_views_flush = time.monotonic()
+
+    try:
+        cursor.executemany("""
+            INSERT INTO form_views (form_id, view_date, views) VALUES (%s, CURDATE(), %s)
+            ON DUPLICATE KEY UPDATE views = views + VALUES(views)
+        """, list(pending.items()))
+    except Exception:
+        # Devolve as contagens para a próxima tentativa
+        with _views_lock:
+            _views.update(pending)
+        raise
+    return True
+
+
+def fetch_candidates(cursor, limit: int = PREWARM_BATCH) -> List[Dict[str, Any]]:
+    """Formulários pendentes prontos para aquecer, do mais visto para o menos visto."""
+    cursor.execute("""
+        SELECT f.id, f.title, f.archived_at, f.archive_move, ap.last_response_at,
+               COALESCE(v.views, 0) AS views, COALESCE(v.score, 0) AS view_score
+        FROM analysis_prewarm ap
+        JOIN forms f ON f.id = ap.form_id
+        LEFT JOIN (
+            SELECT form_id, SUM(views) AS views,
+                   SUM(views / (DATEDIFF(CURDATE(), view_date) + 1)) AS score
+            FROM form_views
+            WHERE view_date >= CURDATE() - INTERVAL %s DAY
+            GROUP BY form_id
+        ) v ON v.form_id = ap.form_id
+        WHERE ap.pending_since IS NOT NULL
+          AND ap.failures < %s
+          AND f.archived_at IS NULL AND f.archive_move IS NULL
+          AND (ap.last_response_at <= NOW() - INTERVAL %s SECOND
+               OR ap.pending_since <= NOW() - INTERVAL %s SECOND)
+          AND COALESCE(v.views, 0) >= %s
+        ORDER BY view_score DESC, ap.pending_since ASC
+        LIMIT %s
+    """, (PREWARM_VIEW_DAYS, PREWARM_MAX_FAILURES, PREWARM_SETTLE_SECONDS,
+          PREWARM_MAX_DELAY, PREWARM_MIN_VIEWS, limit))
+    return cursor.fetchall()
+
+
+def _batches(count: int) -> int:
+    return -(-count // AZURE_BATCH_SIZE)
+
+
+def estimate_costs(cursor, form_ids: List[int]) -> Dict[int, int]:
+    """
+    Chamadas à IA que a regeneração de cada formulário deve fazer, pelas contagens
+    de respostas de cada pergunta de texto (mesmos lotes de call_in_batches):
+    sentimento de todas, frases-chave da amostra, rótulos das sem sentimento e o resumo.
+    """
+    if not form_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT q.form_id, COUNT(a.id) AS answers, COALESCE(SUM(a.sentiment IS NULL), 0) AS unlabelled
+        FROM questions q
+        LEFT JOIN answers a ON a.question_id = q.id AND a.answer_text IS NOT NULL
+        WHERE q.form_id IN ({", ".join(["%s"] * len(form_ids))}) AND q.question_type = 'text'
+        GROUP BY q.id, q.form_id
+    """, tuple(form_ids))
+    costs = dict.fromkeys(form_ids, 0)
+    for row in cursor.fetchall():
+        answers, unlabelled = int(row['answers']), int(row['unlabelled'])
+        if not answers:
+            continue
+        costs[row['form_id']] += (_batches(answers)
+                                  + _batches(min(answers, KEY_PHRASES_SAMPLE_SIZE))
+                                  + _batches(unlabelled)
+                                  + SUMMARY_CALLS_PER_QUESTION)
+    return costs
+
+
+def mark_warmed(cursor, form_id: int, last_response_at: Optional[datetime]):
+    """Tira a pendência, a menos que tenha chegado resposta depois da leitura dos candidatos."""
+    cursor.execute("""
+        UPDATE analysis_prewarm
+        SET last_warmed_at = NOW(), failures = 0,
+            pending_since = IF(last_response_at <= %s, NULL, pending_since)
+        WHERE form_id = %s
+    """, (last_response_at, form_id))
+
+
+def mark_failed(cursor, form_id: int):
+    cursor.execute("UPDATE analysis_prewarm SET failures = failures + 1 WHERE form_id = %s", (form_id,))
+
+
+def prune_views(cursor):
+    cursor.execute("DELETE FROM form_views WHERE view_date < CURDATE() - INTERVAL %s DAY", (PREWARM_VIEW_DAYS,))
+
+
+def _calls_last_hour(now: float) -> int:
+    while _spent and _spent[0][0] < now - 3600:
+        _spent.popleft()
+    return sum(cost for _, cost in _spent)
+
+
+def reserve(cost: int) -> bool:
+    """Reserva `cost` chamadas no orçamento da última hora. False se não couber."""
+    with _budget_lock:
+        now = time.monotonic()
+        if _calls_last_hour(now) + cost > PREWARM_AI_CALLS_PER_HOUR:
+            return False
+        _spent.append((now, cost))
+        return True
+
+
+def refund(cost: int):
+    """Devolve uma reserva que acabou não chamando a IA."""
+    with _budget_lock:
+        _spent.append((time.monotonic(), -cost))
+
+
+def _warm_one(connect: Callable[[], Any], warm: Callable[[Any, Dict[str, Any]], str],
+              form: Dict[str, Any], cost: int) -> str:
+    conn = connect()
+    if not conn:
+        refund(cost)
+        return 'failed'
+    try:
+        status = warm(conn, form)
+        cursor = conn.cursor()
+        if status in ('warmed', 'fresh'):
+            mark_warmed(cursor, form['id'], form['last_response_at'])
+        elif status == 'failed':
+            mark_failed(cursor, form['id'])
+        conn.commit()
+    except Exception as e:
+        print(f"Erro ao pré-aquecer formulário {form['id']}: {e}")
+        status = 'failed'
+    finally:
+        conn.close()
+
+    if status in ('fresh', 'busy'):
+        refund(cost)
+    metrics.incr(f'prewarm_{status}')
+    return status
+
+
+def run_cycle(connect: Callable[[], Any], warm: Callable[[Any, Dict[str, Any]], str]) -> Dict[str, int]:
+    """Um ciclo: escolhe os candidatos que cabem no orçamento e aquece em paralelo."""
+    global _backoff, _backoff_until
+    conn = connect()
+    if not conn:
+        return {}
+    try:
+        cursor = conn.cursor(dictionary=True)
+        prune_views(cursor)
+        conn.commit()
+        candidates = fetch_candidates(cursor)
+        costs = estimate_costs(cursor, [form['id'] for form in candidates])
+    finally:
+        conn.close()
+
+    selected = []
+    report = {'candidates': len(candidates), 'deferred': 0, 'over_budget': 0}
+    for form in candidates:
+        cost = costs[form['id']]
+        if cost > PREWARM_AI_CALLS_PER_HOUR:
+            # Nunca caberia no orçamento: fica para a regeneração sob demanda
+            report['over_budget'] += 1
+            continue
+        if cost and not reserve(cost):
+            # Os mais baratos (ex.: só múltipla escolha) ainda podem caber
+            report['deferred'] += 1
+            continue
+        selected.append((form, cost))
+    metrics.incr('prewarm_quota_deferred', report['deferred'])
+
+    with ThreadPoolExecutor(max_workers=PREWARM_CONCURRENCY) as pool:
+        statuses = list(pool.map(lambda item: _warm_one(connect, warm, *item), selected))
+    for status in statuses:
+        report[status] = report.get(status, 0) + 1
+
+    # Falha costuma ser cota/limite do provedor: pausa crescente até voltar a funcionar
+    if report.get('failed'):
+        _backoff = min(max(PREWARM_BACKOFF_MIN, _backoff * 2), PREWARM_BACKOFF_MAX)
+        _backoff_until = time.monotonic() + _backoff
+    elif report.get('warmed'):
+        _backoff = 0
+    return report
+
+
+def run(connect: Callable[[], Any], warm: Callable[[Any, Dict[str, Any]], str], once: bool = False):
+    """Laço do processo de pré-aquecimento (um ciclo a cada PREWARM_INTERVAL segundos)."""
+    windows = parse_windows(PREWARM_WINDOWS)
+    print(f"Pré-aquecimento: janelas={PREWARM_WINDOWS or 'sempre'}, concorrência={PREWARM_CONCURRENCY}, "
+          f"orçamento={PREWARM_AI_CALLS_PER_HOUR} chamadas/hora")
+    while True:
+        if time.monotonic() < _backoff_until:
+            print(f"Em pausa após falhas do provedor ({int(_backoff_until - time.monotonic())}s restantes).")
+        elif not in_window(windows, datetime.now().time()):
+            if once:
+                print("Fora da janela de pré-aquecimento.")
+        else:
+            report = run_cycle(connect, warm)
+            if report.get('candidates') or once:
+                print(f"[{datetime.now():%H:%M:%S}] {report}")
+        if once:
+            return
+        time.sleep(PREWARM_INTERVAL)
@@ -0,0 +1,215 @@
+# services/rollups.py
+"""
+Tabelas de agregação por período (rollups) para volume de respostas e
+contagem de sentimentos por pergunta de texto.
+
+As funções recebem um cursor já aberto e NÃO fazem commit: quem chama decide
+a transação (assim o rollup entra junto com a resposta no submit_form).
+"""
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+GRANULARITIES = ('hour', 'day', 'month')
+
+# Formatos do MySQL para "arredondar" submitted_at para o início do período
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00',
+    'month': '%Y-%m-01 00:00:00',
+}
+
+SENTIMENT_LABELS = ('positive', 'neutral', 'negative')
+
+# Limite de pontos por série, para um range enorme em 'hour' não travar a página
+MAX_TREND_POINTS = 5000
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def bucket_start(dt: datetime, granularity: str) -> datetime:
+    """Arredonda uma data para o início do período (mesma regra do BUCKET_FORMATS)."""
+    if granularity == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_bucket(dt: datetime, granularity: str) -> datetime:
+    """Retorna o início do período seguinte."""
+    if granularity == 'hour':
+        return dt + timedelta(hours=1)
+    if granularity == 'day':
+        return dt + timedelta(days=1)
+    if dt.month == 12:
+        return dt.replace(year=dt.year + 1, month=1)
+    return dt.replace(month=dt.month + 1)
+
+
+def default_range(granularity: str, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Range padrão: últimas 48 horas, últimos 30 dias ou últimos 12 meses."""
+    now = now or datetime.now()
+    if granularity == 'hour':
+        return bucket_start(now - timedelta(hours=47), 'hour'), now
+    if granularity == 'day':
+        return bucket_start(now - timedelta(days=29), 'day'), now
+    start = bucket_start(now, 'month')
+    for _ in range(11):
+        start = bucket_start(start - timedelta(days=1), 'month')
+    return start, now
+
+
+def record_responses(cursor, response_ids: List[int]):
+    """Soma as respostas informadas nos rollups de volume (todas as granularidades)."""
+    if not response_ids:
+        return
+    for granularity, fmt in BUCKET_FORMATS.items():
+        cursor.execute(f"""
+            INSERT INTO response_rollups (form_id, granularity, bucket_start, response_count)
+            SELECT * FROM (
+                SELECT form_id, '{granularity}' AS granularity,
+                       DATE_FORMAT(submitted_at, '{fmt}') AS bucket, COUNT(*) AS cnt
+                FROM responses
+                WHERE id IN ({_placeholders(response_ids)})
+                GROUP BY form_id, bucket
+            ) AS agg
+            ON DUPLICATE KEY UPDATE response_count = response_rollups.response_count + agg.cnt
+        """, tuple(response_ids))
+
+
+def record_sentiments(cursor, labelled: List[Tuple[int, str]]):
+    """
+    Grava o sentimento de cada resposta de texto (answers.sentiment) e soma
+    nos rollups de sentimento. Recebe pares (answer_id, label).
+    Respostas que já tinham sentimento são ignoradas para não contar duas vezes.
+    """
+    labelled = [(aid, label) for aid, label in labelled if label in SENTIMENT_LABELS]
+    if not labelled:
+        return
+
+    answer_ids = [aid for aid, _ in labelled]
+    cursor.execute(
+        f"SELECT id FROM answers WHERE id IN ({_placeholders(answer_ids)}) AND sentiment IS NULL",
+        tuple(answer_ids)
+    )
+    pending = {row[0] if isinstance(row, tuple) else row['id'] for row in cursor.fetchall()}
+    labelled = [(aid, label) for aid, label in labelled if aid in pending]
+    if not labelled:
+        return
+
+    cursor.executemany(
+        "UPDATE answers SET sentiment=%s WHERE id=%s",
+        [(label, aid) for aid, label in labelled]
+    )
+
+    answer_ids = [aid for aid, _ in labelled]
+    for granularity, fmt in BUCKET_FORMATS.items():
+        cursor.execute(f"""
+            INSERT INTO sentiment_rollups (form_id, question_id, granularity, bucket_start, positive, neutral, negative)
+            SELECT * FROM (
+                SELECT r.form_id, a.question_id, '{granularity}' AS granularity,
+                       DATE_FORMAT(r.submitted_at, '{fmt}') AS bucket,
+                       SUM(a.sentiment = 'positive') AS pos,
+                       SUM(a.sentiment = 'neutral') AS neu,
+                       SUM(a.sentiment = 'negative') AS neg
+                FROM answers a
+                JOIN responses r ON a.response_id = r.id
+                WHERE a.id IN ({_placeholders(answer_ids)})
+                GROUP BY r.form_id, a.question_id, bucket
+            ) AS agg
+            ON DUPLICATE KEY UPDATE
+                positive = sentiment_rollups.positive + agg.pos,
+                neutral = sentiment_rollups.neutral + agg.neu,
+                negative = sentiment_rollups.negative + agg.neg
+        """, tuple(answer_ids))
+
+
+def rebuild_rollups(cursor, form_id: Optional[int] = None):
+    """
+    Recalcula os rollups a partir das tabelas brutas (backfill / correção),
+    incluindo as respostas já movidas para o arquivo. Sem form_id, recalcula tudo.
+    """
+    where, params = ("WHERE form_id = %s", (form_id,)) if form_id else ("", ())
+    cursor.execute(f"DELETE FROM response_rollups {where}", params)
+    cursor.execute(f"DELETE FROM sentiment_rollups {where}", params)
+
+    r_where = "WHERE r.form_id = %s" if form_id else ""
+    for responses_table, answers_table in (('responses', 'answers'), ('responses_archive', 'answers_archive')):
+        for granularity, fmt in BUCKET_FORMATS.items():
+            cursor.execute(f"""
+                INSERT INTO response_rollups (form_id, granularity, bucket_start, response_count)
+                SELECT * FROM (
+                    SELECT r.form_id, '{granularity}' AS granularity, DATE_FORMAT(r.submitted_at, '{fmt}') AS bucket, COUNT(*) AS cnt
+                    FROM {responses_table} r {r_where}
+                    GROUP BY r.form_id, bucket
+                ) AS agg
+                ON DUPLICATE KEY UPDATE response_count = response_rollups.response_count + agg.cnt
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO sentiment_rollups (form_id, question_id, granularity, bucket_start, positive, neutral, negative)
+                SELECT * FROM (
+                    SELECT r.form_id, a.question_id, '{granularity}' AS granularity, DATE_FORMAT(r.submitted_at, '{fmt}') AS bucket,
+                           SUM(a.sentiment = 'positive') AS pos, SUM(a.sentiment = 'neutral') AS neu, SUM(a.sentiment = 'negative') AS neg
+                    FROM {answers_table} a
+                    JOIN {responses_table} r ON a.response_id = r.id
+                    {r_where + ' AND' if r_where else 'WHERE'} a.sentiment IS NOT NULL
+                    GROUP BY r.form_id, a.question_id, bucket
+                ) AS agg
+                ON DUPLICATE KEY UPDATE
+                    positive = sentiment_rollups.positive + agg.pos,
+                    neutral = sentiment_rollups.neutral + agg.neu,
+                    negative = sentiment_rollups.negative + agg.neg
+            """, params)
+
+
+def fetch_trend(cursor, form_ids: List[int], granularity: str,
+                start: datetime, end: datetime,
+                question_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Monta a série temporal (volume + sentimento) lendo SOMENTE os rollups.
+    Períodos sem dados aparecem com zero, para o gráfico ficar contínuo.
+    """
+    start = bucket_start(start, granularity)
+    series = {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "labels": [],
+        "responses": [],
+        "sentiment": {label: [] for label in SENTIMENT_LABELS},
+    }
+    if not form_ids:
+        return series
+
+    in_forms = _placeholders(form_ids)
+    cursor.execute(f"""
+        SELECT bucket_start, SUM(response_count) AS total
+        FROM response_rollups
+        WHERE form_id IN ({in_forms}) AND granularity = %s
+          AND bucket_start >= %s AND bucket_start <= %s
+        GROUP BY bucket_start
+    """, (*form_ids, granularity, start, end))
+    volume = {row['bucket_start']: int(row['total']) for row in cursor.fetchall()}
+
+    q_filter, q_params = ("AND question_id = %s", (question_id,)) if question_id else ("", ())
+    cursor.execute(f"""
+        SELECT bucket_start, SUM(positive) AS positive, SUM(neutral) AS neutral, SUM(negative) AS negative
+        FROM sentiment_rollups
+        WHERE form_id IN ({in_forms}) AND granularity = %s
+          AND bucket_start >= %s AND bucket_start <= %s {q_filter}
+        GROUP BY bucket_start
+    """, (*form_ids, granularity, start, end, *q_params))
+    sentiment = {row['bucket_start']: row for row in cursor.fetchall()}
+
+    bucket = start
+    while bucket <= end and len(series['labels']) < MAX_TREND_POINTS:
+        series['labels'].append(bucket.isoformat())
+        series['responses'].append(volume.get(bucket, 0))
+        row = sentiment.get(bucket)
+        for label in SENTIMENT_LABELS:
+            series['sentiment'][label].append(int(row[label]) if row else 0)
+        bucket = next_bucket(bucket, granularity)
+
+    return series
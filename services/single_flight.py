@@ -0,0 +1,63 @@
+# services/single_flight.py
+"""
+Garante que só UM worker regenere a mesma chave (ex.: análise de um form)
+por vez: um lock por chave dentro do processo (threads) + GET_LOCK do MySQL
+entre processos/servidores.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Iterator
+
+# chave -> [lock, quantos estão segurando ou esperando]; sai do dicionário quando ninguém usa
+_local_locks: Dict[str, List] = {}
+_registry_lock = threading.Lock()
+
+
+@contextmanager
+def _local_lock(key: str) -> Iterator[threading.Lock]:
+    with _registry_lock:
+        entry = _local_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _registry_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _local_locks[key]
+
+
+@contextmanager
+def single_flight(conn, key: str, wait: float):
+    """
+    Tenta pegar o lock de `key` esperando até `wait` segundos.
+    Entrega True se pegou (este worker deve regenerar) ou False se estourou o tempo.
+
+        with single_flight(conn, f"analysis:{form_id}", 10) as acquired:
+            ...
+    """
+    deadline = time.monotonic() + wait
+    with _local_lock(key) as local:
+        if not local.acquire(timeout=wait):
+            yield False
+            return
+
+        try:
+            # GET_LOCK é por conexão e aceita timeout em segundos inteiros
+            remaining = max(0, math.ceil(deadline - time.monotonic()))
+            lock_name = f"acertus:{key}"[:64]
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (lock_name, remaining))
+            if cursor.fetchone()[0] != 1:
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+                cursor.fetchone()
+        finally:
+            local.release()
@@ -0,0 +1,176 @@
+# services/summary_cache.py
+"""
+Cache dos resumos do Gemini, endereçado pelo conteúdo: a chave é o hash do
+conjunto de respostas normalizado + template do prompt + nome do modelo.
+
+Dois níveis:
+  1. Memória do processo (LRU com TTL, via cachetools)
+  2. Arquivos locais em SUMMARY_CACHE_DIR, compartilhados entre workers
+
+Os arquivos ficam em uma pasta por "namespace" (hash de prompt + modelo).
+Quando o prompt ou o modelo muda, as pastas antigas são apagadas. Dentro do
+namespace, arquivos expirados são apagados ao serem lidos e, de tempos em
+tempos, uma limpeza remove os vencidos e os mais antigos além do limite.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+from services import metrics
+
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", "./cache/summaries")
+SUMMARY_CACHE_MAX_ITEMS = int(os.getenv("SUMMARY_CACHE_MAX_ITEMS", "512"))
+SUMMARY_CACHE_MEMORY_TTL = int(os.getenv("SUMMARY_CACHE_MEMORY_TTL", str(60 * 60 * 6)))     # 6 horas
+SUMMARY_CACHE_DISK_TTL = int(os.getenv("SUMMARY_CACHE_DISK_TTL", str(60 * 60 * 24 * 30)))  # 30 dias
+SUMMARY_CACHE_DISK_MAX_FILES = int(os.getenv("SUMMARY_CACHE_DISK_MAX_FILES", "10000"))
+# Limpeza do disco roda no put, no máximo uma vez a cada intervalo (s) por processo
+SUMMARY_CACHE_PRUNE_INTERVAL = 10 * 60
+
+_memory = TTLCache(maxsize=SUMMARY_CACHE_MAX_ITEMS, ttl=SUMMARY_CACHE_MEMORY_TTL)
+_lock = threading.Lock()
+_active_namespace: Optional[str] = None
+_last_prune = 0.0
+
+
+def _normalize(texts: List[str]) -> List[str]:
+    """Mesmo conjunto de respostas => mesma chave (ignora ordem, espaços e vazios)."""
+    return sorted(" ".join(t.split()) for t in texts if t and t.strip())
+
+
+def namespace(prompt_template: str, model_name: str) -> str:
+    return hashlib.sha256(f"{model_name}\n{prompt_template}".encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint(texts: List[str], prompt_template: str, model_name: str) -> str:
+    payload = json.dumps(_normalize(texts), ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace(prompt_template, model_name)}:{digest}"
+
+
+def _path(key: str) -> str:
+    ns, digest = key.split(":", 1)
+    return os.path.join(SUMMARY_CACHE_DIR, ns, f"{digest}.json")
+
+
+def _activate(ns: str):
+    """Na primeira chamada com um novo prompt/modelo, apaga os namespaces antigos do disco."""
+    global _active_namespace
+    if _active_namespace == ns:
+        return
+    with _lock:
+        if _active_namespace == ns:
+            return
+        if os.path.isdir(SUMMARY_CACHE_DIR):
+            for entry in os.listdir(SUMMARY_CACHE_DIR):
+                if entry != ns:
+                    shutil.rmtree(os.path.join(SUMMARY_CACHE_DIR, entry), ignore_errors=True)
+                    metrics.incr("summary_cache_invalidated_namespaces")
+        _memory.clear()
+        _active_namespace = ns
+
+
+def get(key: str) -> Optional[str]:
+    """Procura o resumo na memória e depois no disco. None = miss."""
+    _activate(key.split(":", 1)[0])
+
+    with _lock:
+        summary = _memory.get(key)
+    if summary is not None:
+        metrics.incr("summary_cache_memory_hits")
+        return summary
+
+    try:
+        with open(_path(key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        metrics.incr("summary_cache_misses")
+        return None
+
+    if time.time() - entry.get("created_at", 0) > SUMMARY_CACHE_DISK_TTL:
+        _remove(_path(key))
+        metrics.incr("summary_cache_misses")
+        return None
+
+    with _lock:
+        _memory[key] = entry["summary_text"]
+    metrics.incr("summary_cache_disk_hits")
+    return entry["summary_text"]
+
+
+def put(key: str, summary_text: str):
+    """Grava o resumo nos dois níveis (escrita atômica no disco)."""
+    with _lock:
+        _memory[key] = summary_text
+
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"summary_text": summary_text, "created_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Erro ao gravar cache de resumo: {e}")
+    _maybe_prune(os.path.dirname(path))
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+        metrics.incr("summary_cache_disk_evictions")
+    except OSError:
+        pass
+
+
+def prune(directory: str):
+    """Apaga os arquivos vencidos e, acima de SUMMARY_CACHE_DISK_MAX_FILES, os mais antigos."""
+    now = time.time()
+    try:
+        entries = [(e.stat().st_mtime, e.path) for e in os.scandir(directory) if e.is_file()]
+    except OSError:
+        return
+    kept = []
+    for mtime, path in entries:
+        # .tmp recente pode ser uma escrita em andamento de outro worker
+        stale_after = SUMMARY_CACHE_PRUNE_INTERVAL if path.endswith(".tmp") else SUMMARY_CACHE_DISK_TTL
+        if now - mtime > stale_after:
+            _remove(path)
+        elif not path.endswith(".tmp"):
+            kept.append((mtime, path))
+    kept.sort()
+    for _, path in kept[:max(0, len(kept) - SUMMARY_CACHE_DISK_MAX_FILES)]:
+        _remove(path)
+
+
+def _maybe_prune(directory: str):
+    global _last_prune
+    with _lock:
+        if _last_prune and time.monotonic() - _last_prune < SUMMARY_CACHE_PRUNE_INTERVAL:
+            return
+        _last_prune = time.monotonic()
+    prune(directory)
+
+
+def clear():
+    """Invalidação explícita: limpa memória e disco."""
+    global _active_namespace
+    with _lock:
+        _memory.clear()
+        _active_namespace = None
+        shutil.rmtree(SUMMARY_CACHE_DIR, ignore_errors=True)
+    metrics.incr("summary_cache_cleared")
+
+
+def stats():
+    counters = metrics.snapshot()
+    return {
+        "memory_items": len(_memory),
+        "memory_max_items": SUMMARY_CACHE_MAX_ITEMS,
+        **{name: value for name, value in counters.items() if name.startswith("summary_cache_")},
+    }
@@ -0,0 +1,242 @@
+# services/urgency.py
+"""
+Pontuação de urgência das respostas de texto, feita FORA da requisição de envio.
+
+O submit_form só coloca os ids das respostas numa fila em memória; uma thread
+em segundo plano calcula a nota (heurística local de palavras-chave e, na faixa
+de dúvida, confirmação opcional pelo sentimento da IA), grava em
+answers.urgency_score e registra um alerta em urgent_alerts quando passa do
+limite. O dashboard recebe os alertas novos por SSE em /api/alerts/stream.
+
+A fila vive só na memória do processo; para nada se perder num restart, a
+thread também varre periodicamente as respostas recentes ainda sem nota
+(urgency_score IS NULL) e as pontua com alertas ligados. Respostas importadas
+ficam de fora da varredura: são históricas e não devem virar alerta.
+"""
+import os
+import queue
+import re
+import threading
+import unicodedata
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from services import metrics
+
+# Nota a partir da qual a resposta vira alerta
+URGENCY_THRESHOLD = 0.6
+# Faixa de dúvida: só aqui pedimos confirmação ao modelo
+URGENCY_CONFIRM_MIN = 0.35
+URGENCY_CONFIRM_BONUS = 0.25
+URGENCY_MODEL_CONFIRM = os.getenv("URGENCY_MODEL_CONFIRM", "0") == "1"
+
+SCORING_BATCH_SIZE = 20
+# Varredura de pendentes: intervalo (s) e até quantas horas atrás procurar
+SWEEP_INTERVAL = 60
+SWEEP_HOURS = 24
+EXCERPT_LENGTH = 280
+
+# Peso de cada termo (sem acento, minúsculo). Combinação por "ou ruidoso":
+# nota = 1 - produto(1 - peso) dos termos encontrados.
+URGENT_TERMS = {
+    'urgente': 0.5, 'urgencia': 0.5, 'emergencia': 0.6, 'socorro': 0.6,
+    'acidente': 0.6, 'ferido': 0.6, 'machucado': 0.5, 'incendio': 0.7, 'fogo': 0.4,
+    'vazamento': 0.5, 'perigo': 0.5, 'perigoso': 0.5, 'risco': 0.35, 'grave': 0.4,
+    'assedio': 0.7, 'agressao': 0.7, 'ameaca': 0.6, 'discriminacao': 0.6, 'abuso': 0.6,
+    'nao funciona': 0.3, 'quebrado': 0.25, 'quebrada': 0.25, 'parado': 0.25, 'parada': 0.25, 'imediato': 0.3, 'imediatamente': 0.3,
+}
+NEGATIVE_TERMS = {
+    'pessimo': 0.15, 'horrivel': 0.15, 'absurdo': 0.15, 'inaceitavel': 0.2,
+    'revoltante': 0.2, 'descaso': 0.15, 'inadmissivel': 0.2,
+}
+EMPHASIS_BONUS = 0.1
+
+_queue: "queue.Queue[int]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def heuristic_score(text: str) -> Tuple[float, List[str]]:
+    """Nota de 0 a 1 e os termos que a justificam."""
+    normalized = _normalize(text)
+    reasons = []
+    remaining = 1.0
+    for terms in (URGENT_TERMS, NEGATIVE_TERMS):
+        for term, weight in terms.items():
+            if re.search(rf"\b{re.escape(term)}\b", normalized):
+                reasons.append(term)
+                remaining *= 1 - weight
+
+    # Ênfase: "!!!" ou boa parte do texto em maiúsculas
+    letters = [c for c in text if c.isalpha()]
+    if "!!" in text or (len(letters) >= 10 and sum(c.isupper() for c in letters) / len(letters) > 0.6):
+        reasons.append('ênfase')
+        remaining *= 1 - EMPHASIS_BONUS
+
+    return round(1 - remaining, 3), reasons
+
+
+def score_answers(conn, answer_ids: List[int],
+                  confirm: Optional[Callable[[List[str]], List[Optional[str]]]] = None,
+                  alerts: bool = True) -> int:
+    """
+    Pontua as respostas informadas, grava urgency_score e cria os alertas.
+    `confirm` recebe textos e devolve rótulos de sentimento (usado só na faixa de dúvida).
+    Retorna quantos alertas foram criados.
+    """
+    if not answer_ids:
+        return 0
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"""
+        SELECT a.id, a.answer_text, r.form_id
+        FROM answers a
+        JOIN responses r ON a.response_id = r.id
+        WHERE a.id IN ({", ".join(["%s"] * len(answer_ids))})
+          AND a.answer_text IS NOT NULL AND a.urgency_score IS NULL
+    """, tuple(answer_ids))
+    rows = cursor.fetchall()
+
+    scored = []
+    for row in rows:
+        score, reasons = heuristic_score(row['answer_text'])
+        scored.append({**row, "score": score, "reasons": reasons})
+
+    # Confirmação pelo modelo só para quem ficou na faixa de dúvida
+    doubtful = [item for item in scored if URGENCY_CONFIRM_MIN <= item['score'] < URGENCY_THRESHOLD]
+    if confirm and doubtful:
+        labels = confirm([item['answer_text'] for item in doubtful])
+        for item, label in zip(doubtful, labels):
+            if label == 'negative':
+                item['score'] = round(min(1.0, item['score'] + URGENCY_CONFIRM_BONUS), 3)
+                item['reasons'].append('sentimento negativo')
+        metrics.incr('urgency_model_confirmations', len(doubtful))
+
+    # Cada worker (e a varredura) pode pegar a mesma resposta: só quem grava a
+    # nota primeiro fica com ela e cria o alerta
+    claimed = []
+    for item in scored:
+        cursor.execute("UPDATE answers SET urgency_score=%s WHERE id=%s AND urgency_score IS NULL",
+                       (item['score'], item['id']))
+        if cursor.rowcount == 1:
+            claimed.append(item)
+    urgent = [item for item in claimed if item['score'] >= URGENCY_THRESHOLD] if alerts else []
+    if urgent:
+        cursor.executemany("""
+            INSERT IGNORE INTO urgent_alerts (form_id, answer_id, score, excerpt, reasons)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(item['form_id'], item['id'], item['score'],
+               item['answer_text'][:EXCERPT_LENGTH], ", ".join(item['reasons'])[:255]) for item in urgent])
+    conn.commit()
+
+    metrics.incr('urgency_scored', len(claimed))
+    metrics.incr('urgency_alerts', len(urgent))
+    return len(urgent)
+
+
+def find_unscored(cursor, hours: int = SWEEP_HOURS, limit: int = 500) -> List[int]:
+    """
+    Respostas de texto das últimas `hours` horas que ainda não foram pontuadas.
+    Ignora as importadas (a data delas pode ser a da importação, não a do envio):
+    essas são pontuadas sem alertas pelo `flask score-pending`.
+    """
+    cursor.execute("""
+        SELECT a.id
+        FROM responses r
+        JOIN answers a ON a.response_id = r.id
+        WHERE r.submitted_at >= NOW() - INTERVAL %s HOUR
+          AND r.imported = 0
+          AND a.answer_text IS NOT NULL AND a.urgency_score IS NULL
+        LIMIT %s
+    """, (hours, limit))
+    return [row[0] if isinstance(row, tuple) else row['id'] for row in cursor.fetchall()]
+
+
+def _score(connect: Callable[[], Any], confirm, ids: Optional[List[int]] = None):
+    """Pontua os ids informados ou, sem ids, as pendentes encontradas pela varredura."""
+    conn = connect()
+    if not conn:
+        if ids:
+            metrics.incr('urgency_dropped', len(ids))
+        return
+    try:
+        if ids is None:
+            ids = find_unscored(conn.cursor())
+            metrics.incr('urgency_swept', len(ids))
+        for start in range(0, len(ids), SCORING_BATCH_SIZE):
+            score_answers(conn, ids[start:start + SCORING_BATCH_SIZE], confirm if URGENCY_MODEL_CONFIRM else None)
+    except Exception as e:
+        print(f"Erro na pontuação de urgência: {e}")
+        metrics.incr('urgency_errors')
+    finally:
+        conn.close()
+
+
+def _run(connect: Callable[[], Any], confirm):
+    # Primeira volta é uma varredura: recupera o que a fila perdeu no último restart
+    _score(connect, confirm)
+    while True:
+        try:
+            ids = [_queue.get(timeout=SWEEP_INTERVAL)]
+        except queue.Empty:
+            _score(connect, confirm)
+            continue
+        # Junta o que mais estiver na fila para pontuar em lote
+        while len(ids) < SCORING_BATCH_SIZE:
+            try:
+                ids.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        _score(connect, confirm, ids)
+
+
+def start(connect: Callable[[], Any],
+          confirm: Optional[Callable[[List[str]], List[Optional[str]]]] = None):
+    """Sobe a thread de pontuação, se ainda não estiver rodando."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, args=(connect, confirm), name="urgency-scoring", daemon=True)
+            _worker.start()
+
+
+def enqueue(answer_ids: List[int], connect: Callable[[], Any],
+            confirm: Optional[Callable[[List[str]], List[Optional[str]]]] = None):
+    """Coloca as respostas na fila (e sobe a thread de pontuação, se preciso)."""
+    if not answer_ids:
+        return
+    start(connect, confirm)
+    for answer_id in answer_ids:
+        _queue.put(answer_id)
+
+
+def fetch_alerts(cursor, user_id: int, after_id: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    """Alertas dos formulários do usuário com id maior que `after_id` (mais antigos primeiro)."""
+    cursor.execute("""
+        SELECT ua.id, ua.form_id, f.title AS form_title, ua.answer_id, ua.score, ua.excerpt, ua.reasons, ua.created_at
+        FROM urgent_alerts ua
+        JOIN forms f ON ua.form_id = f.id
+        WHERE f.user_id = %s AND ua.id > %s
+        ORDER BY ua.id ASC
+        LIMIT %s
+    """, (user_id, after_id, limit))
+    return [{**row, "score": float(row['score']), "created_at": row['created_at'].isoformat() if row['created_at'] else None}
+            for row in cursor.fetchall()]
+
+
+def latest_alert_id(cursor, user_id: int, skip_recent: int = 10) -> int:
+    """Ponto de partida do feed: deixa os `skip_recent` alertas mais novos para serem enviados na conexão."""
+    cursor.execute("""
+        SELECT ua.id FROM urgent_alerts ua
+        JOIN forms f ON ua.form_id = f.id
+        WHERE f.user_id = %s
+        ORDER BY ua.id DESC
+        LIMIT 1 OFFSET %s
+    """, (user_id, skip_recent))
+    row = cursor.fetchone()
+    return row['id'] if row else 0